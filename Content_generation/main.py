@@ -1,5 +1,6 @@
 from fastapi import FastAPI, Request, Form, HTTPException
-from fastapi.responses import HTMLResponse, RedirectResponse
+from fastapi.responses import HTMLResponse, RedirectResponse, StreamingResponse
+from fastapi.concurrency import run_in_threadpool
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 import json
@@ -8,15 +9,16 @@ from urllib.parse import quote
 from typing import List, Dict, Any
 
 # Import routers and utilities
-from routes import title, search, summarize
+from routes import title, search, summarize, stats
 from utils.title_generator import title_generate
 from routes.search import search_content
 from models.schemas import SearchRequest
 from routes.summarize import summarize_links
 from routes.summarize import SummarizeLinksRequest
 from utils.input_layout import LayoutExtractor
-from utils.content_generation import generate_content
-from utils.enhancing import refine_content 
+from utils.content_generation import generate_content, stream_content, agenerate_content_sections
+from utils.enhancing import refine_content, stream_refine_content
+from utils.research_store import get_research_store
 
 from dotenv import load_dotenv
 load_dotenv()
@@ -34,6 +36,51 @@ templates = Jinja2Templates(directory="templates")
 app.include_router(title.router, prefix="/content")
 app.include_router(search.router, prefix="/content")
 app.include_router(summarize.router, prefix="/api")
+app.include_router(stats.router, prefix="/api")
+
+# ------------------- HELPERS -------------------
+
+def parse_layout_field(layout: str) -> list:
+    """Parse the (possibly double-encoded) layout JSON posted by the forms."""
+    try:
+        parsed_layout = json.loads(layout)
+        if isinstance(parsed_layout, str):
+            # Handle double-encoded JSON
+            parsed_layout = json.loads(parsed_layout)
+    except json.JSONDecodeError as e:
+        raise ValueError(f"Invalid layout JSON: {str(e)}")
+
+    # Validate layout structure
+    if not isinstance(parsed_layout, list):
+        raise ValueError("Layout must be a list")
+    return parsed_layout
+
+
+async def sse_events(deltas):
+    """Wrap a token stream as server-sent events: one JSON-encoded chunk per event."""
+    try:
+        async for delta in deltas:
+            yield f"data: {json.dumps(delta)}\n\n"
+        yield "event: done\ndata: {}\n\n"
+    except Exception as e:
+        print(f"Error while streaming: {str(e)}")
+        yield f"event: error\ndata: {json.dumps(str(e))}\n\n"
+
+
+async def stream_sections_result(**kwargs):
+    """Section-parallel generation delivered through the SSE channel once all sections are stitched."""
+    content = await agenerate_content_sections(**kwargs)
+    if not content:
+        raise RuntimeError("Content generation failed.")
+    yield content
+
+
+def sse_response(deltas) -> StreamingResponse:
+    return StreamingResponse(
+        sse_events(deltas),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 # ------------------- UI ROUTES -------------------
 
@@ -51,7 +98,7 @@ async def get_home(request: Request):
 
 @app.post("/generate")
 async def generate_titles_view(request: Request, topic: str = Form(...)):
-    titles = title_generate(topic)
+    titles = await run_in_threadpool(title_generate, topic)
     return templates.TemplateResponse("generate_titles.html", {
         "request": request,
         "titles": titles,
@@ -72,7 +119,8 @@ async def generate_new_titles_view(request: Request, topic: str = Form(...), all
         print("Error loading all_titles:", e)
         all_titles_loaded = []
 
-    new_titles = title_generate(topic)
+    # Bypass the prompt cache so the user actually gets a fresh set of titles
+    new_titles = await run_in_threadpool(title_generate, topic, use_cache=False)
     updated_all_titles = all_titles_loaded + [new_titles]
 
     return templates.TemplateResponse("generate_titles.html", {
@@ -124,7 +172,9 @@ async def search_ui_post(
     try:
         # Use our search functionality
         from utils.internet_search import search_topic
-        search_results = search_topic(topic, num_results)
+        # Pages extracted while searching are kept under this session for the summarize stage
+        research_session = get_research_store().new_session()
+        search_results = await run_in_threadpool(search_topic, topic, num_results, research_session)
         
         # Format results for display
         formatted_results = []
@@ -140,7 +190,8 @@ async def search_ui_post(
             "topic": topic,
             "title": title,
             "results": formatted_results,
-            "num_results": num_results
+            "num_results": num_results,
+            "research_session": research_session
         })
     except Exception as e:
         print(f"Error in search: {str(e)}")
@@ -160,7 +211,8 @@ async def summarize_ui(
     selected_links: list[str] = Form(default=[]),
     custom_urls: str = Form(default=""),
     custom_research: str = Form(default=""),
-    title: str = Form(default="")
+    title: str = Form(default=""),
+    research_session: str = Form(default="")
 ):
     try:
         # Combine all links: selected + custom
@@ -173,8 +225,8 @@ async def summarize_ui(
 
         # Summarize from links (if any)
         if links:
-            summary_request = SummarizeLinksRequest(topic=topic, links=links)
-            link_summary = summarize_links(summary_request)
+            summary_request = SummarizeLinksRequest(topic=topic, links=links, session_id=research_session or None)
+            link_summary = await run_in_threadpool(summarize_links, summary_request)
             summary_parts.append(f"🔗 Summary from URLs:\n{link_summary}")
 
         # Summarize custom research text (if any)
@@ -232,18 +284,18 @@ async def layout_ui_handler(
     if layout_generator == "Generate Layout":
         if not all([topic, title, summary, content_type]):
             raise HTTPException(status_code=400, detail="Missing fields for default layout generation.")
-        layout = le.default_layout(topic, title, content_type, summary)
+        layout = await run_in_threadpool(le.default_layout, topic, title, content_type, summary)
 
     elif layout_generator == "Custom layout":
         if not all([custom_instructions, summary]):
             raise HTTPException(status_code=400, detail="Missing fields for custom layout generation.")
         # Pass additional_info with default empty string
-        layout = le.custom_layout(custom_instructions, summary, additional_info)
+        layout = await run_in_threadpool(le.custom_layout, custom_instructions, summary, additional_info)
 
     elif layout_generator == "URL layout":
         if not url:
             raise HTTPException(status_code=400, detail="URL is required for URL layout.")
-        layout = le.extract_layout(url, summary)  # Pass summary as research context
+        layout = await run_in_threadpool(le.extract_layout, url, summary)  # Pass summary as research context
 
     # Ensure the layout is returned as a list of dictionaries
     if not isinstance(layout, list):
@@ -316,32 +368,60 @@ async def post_generate_content(
     layout: str = Form(...),
     content_type: str = Form(...),
     tone: str = Form(...),
-    additional_info: str = Form(default="")  # Add this parameter
+    additional_info: str = Form(default=""),  # Add this parameter
+    stream: str = Form(default=""),
+    generation_mode: str = Form(default="single")
 ):
     try:
-        # Parse the layout JSON string
-        try:
-            parsed_layout = json.loads(layout)
-            if isinstance(parsed_layout, str):
-                # Handle double-encoded JSON
-                parsed_layout = json.loads(parsed_layout)
-        except json.JSONDecodeError as e:
-            raise ValueError(f"Invalid layout JSON: {str(e)}")
-
-        # Validate layout structure
-        if not isinstance(parsed_layout, list):
-            raise ValueError("Layout must be a list")
+        parsed_layout = parse_layout_field(layout)
+
+        if stream == "on":
+            # Render the page right away; the browser pulls tokens from /generate_content/stream
+            return templates.TemplateResponse("final_output.html", {
+                "request": request,
+                "title": title,
+                "content": "",
+                "layout": layout,
+                "summary": summary,
+                "tone": tone,
+                "topic": topic,
+                "additional_info": additional_info,
+                "search_context": summary,
+                "stream_url": "/generate_content/stream",
+                "stream_fields": {
+                    "topic": topic,
+                    "title": title,
+                    "summary": summary,
+                    "layout": layout,
+                    "content_type": content_type,
+                    "tone": tone,
+                    "additional_info": additional_info,
+                    "generation_mode": generation_mode
+                }
+            })
 
         # Generate content
-        content = generate_content(
-            topic=topic,
-            title=title,
-            research_info=summary,
-            layout=parsed_layout,
-            content_type=content_type,
-            tone=tone,
-            additional_info=additional_info  # Add this parameter
-        )
+        if generation_mode == "sections":
+            content = await agenerate_content_sections(
+                topic=topic,
+                title=title,
+                research_info=summary,
+                layout=parsed_layout,
+                content_type=content_type,
+                tone=tone,
+                additional_info=additional_info
+            )
+        else:
+            content = await run_in_threadpool(
+                generate_content,
+                topic=topic,
+                title=title,
+                research_info=summary,
+                layout=parsed_layout,
+                content_type=content_type,
+                tone=tone,
+                additional_info=additional_info  # Add this parameter
+            )
 
         return templates.TemplateResponse("final_output.html", {
             "request": request,
@@ -361,6 +441,43 @@ async def post_generate_content(
             content=f"<h2>Something went wrong: {str(e)}</h2>",
             status_code=500
         )
+
+
+@app.post("/generate_content/stream")
+async def post_generate_content_stream(
+    topic: str = Form(...),
+    title: str = Form(...),
+    summary: str = Form(...),
+    layout: str = Form(...),
+    content_type: str = Form(...),
+    tone: str = Form(...),
+    additional_info: str = Form(default=""),
+    generation_mode: str = Form(default="single")
+):
+    try:
+        parsed_layout = parse_layout_field(layout)
+        if generation_mode == "sections":
+            return sse_response(stream_sections_result(
+                topic=topic,
+                title=title,
+                research_info=summary,
+                layout=parsed_layout,
+                content_type=content_type,
+                tone=tone,
+                additional_info=additional_info
+            ))
+        deltas = stream_content(
+            topic=topic,
+            title=title,
+            research_info=summary,
+            layout=parsed_layout,
+            content_type=content_type,
+            tone=tone,
+            additional_info=additional_info
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return sse_response(deltas)
     
         
 @app.get("/refine-content-ui", response_class=HTMLResponse)
@@ -399,14 +516,38 @@ async def post_refine_content(
     tone: str = Form(...),
     use_layout: str = Form(default=False),
     use_research: str = Form(default=False),
-    additional_instructions: str = Form(default="")
+    additional_instructions: str = Form(default=""),
+    stream: str = Form(default="")
 ):
     try:
         # Convert checkbox values to boolean
         use_layout_bool = use_layout == "on"
         use_research_bool = use_research == "on"
 
-        refined = refine_content(
+        if stream == "on":
+            # Render the page right away; the browser pulls tokens from /refine-content/stream
+            return templates.TemplateResponse("final_output.html", {
+                "request": request,
+                "title": title,
+                "content": "",
+                "layout": layout,
+                "summary": summary,
+                "tone": tone,
+                "topic": topic,
+                "stream_url": "/refine-content/stream",
+                "stream_fields": {
+                    "generated_content": generated_content,
+                    "layout": layout,
+                    "summary": summary,
+                    "tone": tone,
+                    "use_layout": use_layout if use_layout_bool else "",
+                    "use_research": use_research if use_research_bool else "",
+                    "additional_instructions": additional_instructions
+                }
+            })
+
+        refined = await run_in_threadpool(
+            refine_content,
             generated_content=generated_content,
             use_layout_instructions=use_layout_bool,
             use_research_context=use_research_bool,
@@ -431,4 +572,25 @@ async def post_refine_content(
         return HTMLResponse(
             content=f"<h2>Something went wrong: {str(e)}</h2>",
             status_code=500
-        )
\ No newline at end of file
+        )
+
+
+@app.post("/refine-content/stream")
+async def post_refine_content_stream(
+    generated_content: str = Form(...),
+    layout: str = Form(default=""),
+    summary: str = Form(default=""),
+    tone: str = Form(...),
+    use_layout: str = Form(default=""),
+    use_research: str = Form(default=""),
+    additional_instructions: str = Form(default="")
+):
+    return sse_response(stream_refine_content(
+        generated_content=generated_content,
+        use_layout_instructions=use_layout == "on",
+        use_research_context=use_research == "on",
+        layout=layout,
+        research_context=summary,
+        additional_instructions=additional_instructions,
+        tone=tone
+    ))
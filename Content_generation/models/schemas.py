@@ -35,6 +35,7 @@ class LinkSummaryResponse(BaseModel):
 class SummarizeLinksRequest(BaseModel):
     links: List[str]
     topic: str
+    session_id: Optional[str] = None  # research session from the search stage
 
 class LayoutRequest(BaseModel):
     topic: str
@@ -0,0 +1,20 @@
+from fastapi import APIRouter
+from utils.llm_client import llm_cache_stats
+from utils.fetcher import http_cache_stats
+from utils.custom_search import search_cache_stats
+from utils.blob_store import get_blob_store
+from utils.query_memo import get_query_memo
+
+router = APIRouter()
+
+@router.get("/cache-stats")
+def cache_stats():
+    """Hit rates and sizes of the LLM, page, search, query and blob caches."""
+    blobs = get_blob_store()
+    return {
+        "llm": llm_cache_stats(),
+        "http": http_cache_stats(),
+        "search": search_cache_stats(),
+        "queries": get_query_memo().stats(),
+        "blobs": blobs.stats() if blobs else {"enabled": False},
+    }
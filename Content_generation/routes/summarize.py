@@ -8,7 +8,7 @@ router = APIRouter()
 @router.post("/summarize-links", response_model=List[LinkSummaryResponse])
 def summarize_links(request: SummarizeLinksRequest):
     try:
-        research_data = extract_and_summarize_content(request.links, request.topic)
+        research_data = extract_and_summarize_content(request.links, request.topic, session_id=request.session_id)
         if not research_data:
             raise HTTPException(status_code=404, detail="No content could be summarized.")
         return research_data
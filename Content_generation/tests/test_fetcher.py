@@ -0,0 +1,64 @@
+import httpx
+import pytest
+
+from utils.disk_cache import DiskCache
+from utils.fetcher import Fetcher
+from utils.html_engine import ParagraphTextBudget
+from utils.http_cache import HttpCache
+
+PARAGRAPH = b"<p>" + b"Plenty of readable paragraph text. " * 10 + b"</p>"
+HEADERS = {"Content-Type": "text/html; charset=utf-8", "ETag": '"v1"', "Cache-Control": "max-age=600"}
+
+
+def chunked_page(paragraphs):
+    return [b"<html><body>"] + [PARAGRAPH] * paragraphs + [b"</body></html>"]
+
+
+@pytest.fixture
+def server():
+    state = {"requests": 0, "chunks": chunked_page(20)}
+
+    def handler(request):
+        state["requests"] += 1
+        return httpx.Response(200, headers=HEADERS, content=iter(state["chunks"]))
+
+    state["transport"] = httpx.MockTransport(handler)
+    return state
+
+
+@pytest.fixture
+def fetcher(server, tmp_path):
+    fetcher = Fetcher(max_retries=0, cache=HttpCache(DiskCache(str(tmp_path / "http.sqlite3"))))
+    fetcher._client = httpx.Client(transport=server["transport"])
+    yield fetcher
+    fetcher.close()
+
+
+def test_stopped_body_is_cached_for_the_same_budget(fetcher, server):
+    first = fetcher.fetch("https://example.com/a", stop=ParagraphTextBudget(1000))
+    assert first.truncated and len(first.content) < len(b"".join(server["chunks"]))
+
+    again = fetcher.fetch("https://example.com/a", stop=ParagraphTextBudget(1000))
+    assert server["requests"] == 1
+    assert again.truncated and again.content == first.content
+
+    # Another budget (or none) needs the rest of the page
+    full = fetcher.fetch("https://example.com/a")
+    assert server["requests"] == 2
+    assert not full.truncated and full.content == b"".join(server["chunks"])
+
+    # ... and the complete body then serves every caller
+    budgeted = fetcher.fetch("https://example.com/a", stop=ParagraphTextBudget(1000))
+    assert server["requests"] == 2
+    assert not budgeted.truncated and budgeted.content == full.content
+
+
+def test_stop_on_the_last_chunk_is_not_truncation(fetcher, server):
+    server["chunks"] = chunked_page(3)
+    page = b"".join(server["chunks"])
+    result = fetcher.fetch("https://example.com/b", stop=lambda chunk: chunk.endswith(b"</html>"))
+    assert not result.truncated and result.content == page
+
+    cached = fetcher.fetch("https://example.com/b")
+    assert server["requests"] == 1
+    assert not cached.truncated and cached.content == page
@@ -0,0 +1,24 @@
+import pytest
+
+from utils.html_engine import Node, available_engines, parse_html
+
+PAGE = b"<html><head><title> T </title></head><body><div id='a'><p>one</p><ul><li><p>two</p></li></ul></div></body></html>"
+
+
+@pytest.mark.parametrize("engine", available_engines())
+def test_backends_share_the_node_api(engine):
+    doc = parse_html(PAGE, "utf-8", engine=engine)
+    assert doc.engine == engine and doc.title == "T"
+    div = doc.select_first("div#a")
+    assert [node.tag for node in div.children()] == ["p", "ul"]
+    assert [node.text() for node in div.blocks(("p", "ul"))] == ["one", "two"]
+    assert div.select_first("li").parent().key == div.select_first("ul").key
+
+
+def test_incomplete_backend_cannot_be_instantiated():
+    class Partial(Node):
+        def select(self, selector):
+            return []
+
+    with pytest.raises(TypeError):
+        Partial()
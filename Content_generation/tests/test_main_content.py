@@ -0,0 +1,51 @@
+import pytest
+
+from utils.html_engine import available_engines, parse_html
+from utils.main_content import find_main_content, main_paragraphs_text
+
+PARAGRAPH = ("Readable prose about the topic, with commas, numbers like 42, "
+             "and enough words to count as a real paragraph of the article. ")
+
+
+def sectioned_article(sections=5, paragraphs=3):
+    body = "".join(
+        f"<section><h2>Section {i}</h2><div class='para'>"
+        + "".join(f"<p>{PARAGRAPH}</p>" for _ in range(paragraphs))
+        + "</div></section>"
+        for i in range(sections)
+    )
+    return (
+        "<html><head><title>T</title></head><body>"
+        "<nav><a href='/'>Home</a> <a href='/a'>About us</a></nav>"
+        f"<article><h1>Title</h1><p>{PARAGRAPH}</p>{body}</article>"
+        "<footer><p>Copyright, all rights reserved, contact and legal information here.</p></footer>"
+        "</body></html>"
+    ).encode()
+
+
+@pytest.mark.parametrize("engine", available_engines())
+def test_sectioned_article_is_kept_whole(engine):
+    doc = parse_html(sectioned_article(), "utf-8", engine=engine)
+    main = find_main_content(doc)
+    assert main is not None and main.tag == "article"
+    assert len(main.select("h2")) == 5
+    assert main_paragraphs_text(doc).count("Readable prose") == 16
+
+
+@pytest.mark.parametrize("engine", available_engines())
+def test_link_heavy_chrome_loses_to_prose(engine):
+    markup = (
+        "<html><body>"
+        "<div class='sidebar'>" + "".join(f"<p><a href='/{i}'>{PARAGRAPH}</a></p>" for i in range(4)) + "</div>"
+        "<div class='story-body'>" + "".join(f"<p>{PARAGRAPH}</p>" for _ in range(6)) + "</div>"
+        "</body></html>"
+    ).encode()
+    main = find_main_content(parse_html(markup, "utf-8", engine=engine))
+    assert main is not None and main.attr("class") == "story-body"
+
+
+@pytest.mark.parametrize("engine", available_engines())
+def test_short_page_has_no_main_content(engine):
+    doc = parse_html(b"<html><body><p>short</p></body></html>", "utf-8", engine=engine)
+    assert find_main_content(doc) is None
+    assert main_paragraphs_text(doc) == "short"
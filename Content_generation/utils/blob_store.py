@@ -0,0 +1,287 @@
+import os
+import gzip
+import zlib
+import mmap
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from typing import Any, Callable, Dict, Optional
+
+from dotenv import load_dotenv
+from utils.disk_cache import cache_path
+
+try:
+    import zstandard
+except ImportError:  # zstd is optional; gzip is always available
+    zstandard = None
+
+# Load environment variables
+load_dotenv()
+BLOB_STORE_ENABLED = os.getenv("BLOB_STORE_ENABLED", "true").lower() in ("1", "true", "yes")
+BLOB_STORE_MAX_BYTES = int(os.getenv("BLOB_STORE_MAX_BYTES", str(1024 * 1024 * 1024)))
+BLOB_COMPRESSION_LEVEL = int(os.getenv("BLOB_COMPRESSION_LEVEL", "6"))
+
+logger = logging.getLogger(__name__)
+
+
+def content_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+class BlobStore:
+    """
+    Content-addressed store for raw pages and extracted text.
+
+    Blobs are keyed by their SHA-256, compressed with zstd when available
+    (gzip otherwise) and written once, so the same bytes served from several
+    URLs are kept and processed once. An SQLite index maps URLs to the hash of
+    their latest body and records derived blobs (extracted text, summaries)
+    per source hash. Reads go through mmap. Once the compressed size exceeds
+    ``max_bytes`` the least recently read blobs are collected.
+    """
+
+    def __init__(self, root: str, max_bytes: Optional[int] = BLOB_STORE_MAX_BYTES,
+                 level: int = BLOB_COMPRESSION_LEVEL):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.level = level
+        self.codec = "zstd" if zstandard is not None else "gzip"
+        os.makedirs(root, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(os.path.join(root, "index.sqlite3"), check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS blobs (
+                hash TEXT PRIMARY KEY,
+                codec TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                stored_size INTEGER NOT NULL,
+                created REAL NOT NULL,
+                accessed REAL NOT NULL
+            )"""
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS blobs_accessed ON blobs(accessed)")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS urls (
+                url TEXT PRIMARY KEY,
+                hash TEXT NOT NULL,
+                updated REAL NOT NULL
+            )"""
+        )
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS derived (
+                source TEXT NOT NULL,
+                kind TEXT NOT NULL,
+                hash TEXT NOT NULL,
+                PRIMARY KEY (source, kind)
+            )"""
+        )
+        self._stored_bytes = self._conn.execute("SELECT COALESCE(SUM(stored_size), 0) FROM blobs").fetchone()[0]
+        self._stats = {"reads": 0, "misses": 0, "writes": 0, "dedup_hits": 0, "derived_hits": 0, "collected": 0}
+
+    def _path(self, digest: str) -> str:
+        return os.path.join(self.root, digest[:2], digest[2:])
+
+    def _compress(self, data: bytes) -> bytes:
+        if self.codec == "zstd":
+            return zstandard.ZstdCompressor(level=self.level).compress(data)
+        return gzip.compress(data, compresslevel=min(self.level, 9))
+
+    @staticmethod
+    def _decompress(codec: str, buffer) -> bytes:
+        if codec == "zstd":
+            if zstandard is None:
+                raise ValueError("Blob was written with zstd but zstandard is not installed")
+            return zstandard.ZstdDecompressor().decompress(buffer)
+        return zlib.decompress(buffer, 16 + zlib.MAX_WBITS)
+
+    def put(self, data: bytes) -> str:
+        """Store ``data`` (once) and return its hash."""
+        digest = content_hash(data)
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT 1 FROM blobs WHERE hash = ?", (digest,)).fetchone()
+            if row is not None and os.path.exists(self._path(digest)):
+                self._conn.execute("UPDATE blobs SET accessed = ? WHERE hash = ?", (now, digest))
+                self._stats["dedup_hits"] += 1
+                return digest
+        compressed = self._compress(data)
+        path = self._path(digest)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(compressed)
+        os.replace(tmp, path)
+        with self._lock:
+            previous = self._conn.execute("SELECT stored_size FROM blobs WHERE hash = ?", (digest,)).fetchone()
+            if previous is not None:
+                self._stored_bytes -= previous[0]
+            self._conn.execute(
+                "INSERT OR REPLACE INTO blobs (hash, codec, size, stored_size, created, accessed) VALUES (?, ?, ?, ?, ?, ?)",
+                (digest, self.codec, len(data), len(compressed), now, now),
+            )
+            self._stored_bytes += len(compressed)
+            self._stats["writes"] += 1
+            self._collect()
+        return digest
+
+    def get(self, digest: Optional[str]) -> Optional[bytes]:
+        """Return the blob with this hash, or None if it is unknown or was collected."""
+        if not digest:
+            return None
+        with self._lock:
+            row = self._conn.execute("SELECT codec, stored_size FROM blobs WHERE hash = ?", (digest,)).fetchone()
+            if row is None:
+                self._stats["misses"] += 1
+                return None
+            self._conn.execute("UPDATE blobs SET accessed = ? WHERE hash = ?", (time.time(), digest))
+        codec, stored_size = row
+        try:
+            with open(self._path(digest), "rb") as f:
+                if stored_size == 0:
+                    data = self._decompress(codec, f.read())
+                else:
+                    with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as view:
+                        data = self._decompress(codec, view)
+        except (OSError, ValueError, zlib.error) as e:
+            logger.warning(f"Unreadable blob {digest}: {e}")
+            self._forget(digest)
+            with self._lock:
+                self._stats["misses"] += 1
+            return None
+        with self._lock:
+            self._stats["reads"] += 1
+        return data
+
+    def put_url(self, url: str, data: bytes) -> str:
+        """Store the body fetched from ``url`` and point the URL at it."""
+        digest = self.put(data)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO urls (url, hash, updated) VALUES (?, ?, ?)", (url, digest, time.time())
+            )
+        return digest
+
+    def url_hash(self, url: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute("SELECT hash FROM urls WHERE url = ?", (url,)).fetchone()
+        return row[0] if row else None
+
+    def get_url(self, url: str) -> Optional[bytes]:
+        return self.get(self.url_hash(url))
+
+    def put_derived(self, source: str, kind: str, data: bytes) -> str:
+        """Store a blob derived from ``source`` (e.g. text extracted from a PDF)."""
+        digest = self.put(data)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO derived (source, kind, hash) VALUES (?, ?, ?)", (source, kind, digest)
+            )
+        return digest
+
+    def get_derived(self, source: Optional[str], kind: str) -> Optional[bytes]:
+        if not source:
+            return None
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT hash FROM derived WHERE source = ? AND kind = ?", (source, kind)
+            ).fetchone()
+        data = self.get(row[0]) if row else None
+        if data is not None:
+            with self._lock:
+                self._stats["derived_hits"] += 1
+        return data
+
+    def derived_text(self, source: Optional[str], kind: str, compute: Callable[[], str]) -> str:
+        """
+        Text derived from blob ``source``, computed at most once per distinct content.
+
+        Empty results are not stored, so a failed extraction is retried next time.
+        """
+        cached = self.get_derived(source, kind)
+        if cached is not None:
+            return cached.decode("utf-8")
+        text = compute()
+        if source and text:
+            self.put_derived(source, kind, text.encode("utf-8"))
+        return text
+
+    def _forget(self, digest: str):
+        with self._lock:
+            self._delete(digest)
+
+    def _delete(self, digest: str):
+        """Remove one blob and the index rows that point at it. Caller holds the lock."""
+        row = self._conn.execute("SELECT stored_size FROM blobs WHERE hash = ?", (digest,)).fetchone()
+        if row is not None:
+            self._stored_bytes -= row[0]
+        self._conn.execute("DELETE FROM blobs WHERE hash = ?", (digest,))
+        self._conn.execute("DELETE FROM urls WHERE hash = ?", (digest,))
+        self._conn.execute("DELETE FROM derived WHERE hash = ? OR source = ?", (digest, digest))
+        try:
+            os.remove(self._path(digest))
+        except OSError:
+            pass
+
+    def _collect(self):
+        """Drop least recently read blobs until under the size budget. Caller holds the lock."""
+        if self.max_bytes is None:
+            return
+        while self._stored_bytes > self.max_bytes:
+            rows = self._conn.execute("SELECT hash FROM blobs ORDER BY accessed ASC LIMIT 64").fetchall()
+            if not rows:
+                self._stored_bytes = 0
+                break
+            for (digest,) in rows:
+                self._delete(digest)
+                self._stats["collected"] += 1
+                if self._stored_bytes <= self.max_bytes:
+                    break
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            blobs, size = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM blobs").fetchone()
+            urls = self._conn.execute("SELECT COUNT(*) FROM urls").fetchone()[0]
+            return {
+                **self._stats,
+                "codec": self.codec,
+                "blobs": blobs,
+                "urls": urls,
+                "bytes": size,
+                "stored_bytes": self._stored_bytes,
+                "max_bytes": self.max_bytes,
+            }
+
+
+_store: Optional[BlobStore] = None
+_store_lock = threading.Lock()
+
+
+def get_blob_store() -> Optional[BlobStore]:
+    """Return the process-wide blob store, or None when it is disabled."""
+    global _store
+    if not BLOB_STORE_ENABLED:
+        return None
+    with _store_lock:
+        if _store is None:
+            _store = BlobStore(cache_path("blobs"))
+        return _store
+
+
+def store_text(text: str) -> Optional[str]:
+    """Keep extracted text in the shared blob store and return its hash (None when disabled)."""
+    store = get_blob_store()
+    if store is None or not text:
+        return None
+    return store.put(text.encode("utf-8"))
+
+
+def derived_text(source: Optional[str], kind: str, compute: Callable[[], str]) -> str:
+    """``compute()`` memoized per content hash in the shared blob store (computed directly when disabled)."""
+    store = get_blob_store()
+    if store is None:
+        return compute()
+    return store.derived_text(source, kind, compute)
@@ -0,0 +1,35 @@
+import threading
+from contextlib import contextmanager
+from typing import Dict
+from urllib.parse import urlparse
+
+
+def host_of(url: str) -> str:
+    """Lower-cased host name of ``url`` (empty string when it has none)."""
+    if not url.startswith(("http://", "https://")):
+        url = f"https://{url}"
+    return (urlparse(url).hostname or "").lower()
+
+
+class HostLimiter:
+    """Caps how many threads may work on the same host at once."""
+
+    def __init__(self, per_host: int = 2):
+        self.per_host = max(1, per_host)
+        self._lock = threading.Lock()
+        self._semaphores: Dict[str, threading.BoundedSemaphore] = {}
+
+    def _semaphore(self, host: str) -> threading.BoundedSemaphore:
+        with self._lock:
+            semaphore = self._semaphores.get(host)
+            if semaphore is None:
+                semaphore = threading.BoundedSemaphore(self.per_host)
+                self._semaphores[host] = semaphore
+            return semaphore
+
+    @contextmanager
+    def limit(self, url: str):
+        """Block until a slot for the URL's host is free, and hold it for the ``with`` body."""
+        semaphore = self._semaphore(host_of(url))
+        with semaphore:
+            yield
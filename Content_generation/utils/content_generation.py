@@ -1,20 +1,24 @@
 import os
-import openai
+import re
+import json
+import asyncio
 from dotenv import load_dotenv
 from utils.search_engine import get_final_result  
 from utils.input_layout import LayoutExtractor
+from utils.llm_client import chat_completion, achat_completion, astream_chat_completion
 
-# Load environment variables and set the OpenAI API key
+# Load environment variables
 load_dotenv()
-openai.api_key = os.getenv("OPENAI_API_KEY")
+
+# Maximum number of layout sections generated at the same time
+SECTION_CONCURRENCY = int(os.getenv("SECTION_CONCURRENCY", "8"))
 
 # Instantiate layout extractor
 le = LayoutExtractor()
 
-def generate_content(topic, title, research_info, layout, content_type, tone, additional_info=""):
-    # Define tone-specific characteristics
-    tone_characteristics = {
-        "technical": """
+# Tone-specific characteristics shared by every generation mode
+TONE_CHARACTERISTICS = {
+    "technical": """
 TECHNICAL TONE REQUIREMENTS:
 1. Precision & Accuracy:
    - Use exact technical terminology
@@ -42,8 +46,8 @@ TECHNICAL TONE REQUIREMENTS:
    - Focus on solutions and outcomes
    - Include relevant case studies
    - Maintain professional credibility""",
-        
-        "conversational": """
+
+    "conversational": """
 CONVERSATIONAL TONE REQUIREMENTS:
 1. Engagement:
    - Use direct address ("you," "we," "us")
@@ -68,8 +72,8 @@ CONVERSATIONAL TONE REQUIREMENTS:
    - Friendly and approachable
    - Encourage reader interaction
    - Use examples and scenarios""",
-        
-        "formal": """
+
+    "formal": """
 FORMAL TONE REQUIREMENTS:
 1. Language:
    - Use complete words (avoid contractions)
@@ -94,8 +98,8 @@ FORMAL TONE REQUIREMENTS:
    - Proper citations and references
    - Clear headings and subheadings
    - Professional presentation""",
-        
-        "professional": """
+
+    "professional": """
 PROFESSIONAL TONE REQUIREMENTS:
 1. Approach:
    - Balance expertise with accessibility
@@ -120,8 +124,8 @@ PROFESSIONAL TONE REQUIREMENTS:
    - Focus on solutions and outcomes
    - Include relevant case studies
    - Maintain professional credibility""",
-        
-        "friendly": """
+
+    "friendly": """
 FRIENDLY TONE REQUIREMENTS:
 1. Approach:
    - Warm and welcoming
@@ -146,10 +150,12 @@ FRIENDLY TONE REQUIREMENTS:
    - Use analogies and examples
    - Include personal touches
    - Make complex topics accessible"""
-    }
+}
 
+def build_content_messages(topic, title, research_info, layout, content_type, tone, additional_info=""):
+    """Build the system/user messages for a full-article generation request."""
     # Get the specific tone characteristics
-    tone_guide = tone_characteristics.get(tone.lower(), tone_characteristics["professional"])
+    tone_guide = TONE_CHARACTERISTICS.get(tone.lower(), TONE_CHARACTERISTICS["professional"])
     
     # Combine research info and additional info
     combined_info = f"""
@@ -250,23 +256,186 @@ Remember:
 - Use examples, analogies, and visual descriptions to enhance understanding
 - Demonstrate deep industry expertise and insights throughout"""
 
+    return [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": user_prompt}
+    ]
+
+
+def generate_content(topic, title, research_info, layout, content_type, tone, additional_info=""):
+    messages = build_content_messages(topic, title, research_info, layout, content_type, tone, additional_info)
     try:
         print(f"Generating content for topic: {topic}, title: {title}")
-        response = openai.ChatCompletion.create(
+        generated_content = chat_completion(
+            model="gpt-4",
+            messages=messages,
+            temperature=0.7,
+            max_tokens=4000,
+            use_cache=False  # re-submitting the form should produce a new draft
+        ).strip()
+        print(f"Content generated successfully: {len(generated_content)} characters")
+        return generated_content
+
+    except Exception as e:
+        print(f"❌ Error in generate_content(): {e}")
+        return ""
+
+async def stream_content(topic, title, research_info, layout, content_type, tone, additional_info=""):
+    """Same as generate_content() but yields the article token by token as GPT-4 produces it."""
+    messages = build_content_messages(topic, title, research_info, layout, content_type, tone, additional_info)
+    print(f"Streaming content for topic: {topic}, title: {title}")
+    async for delta in astream_chat_completion(
+        model="gpt-4",
+        messages=messages,
+        temperature=0.7,
+        max_tokens=4000
+    ):
+        yield delta
+
+def _layout_sections(layout):
+    """Return (name, instructions) pairs for each layout item, in layout order."""
+    return [
+        (
+            str(item.get('section', item.get('type', 'section'))).strip(),
+            str(item.get('content', item.get('text', ''))).strip()
+        )
+        for item in layout
+    ]
+
+async def _generate_section(index, sections, shared_context, tone_guide, semaphore):
+    """Generate one layout section, aware of its neighbours in the outline."""
+    name, instructions = sections[index]
+    previous_name = sections[index - 1][0] if index > 0 else "(none - this is the first section)"
+    next_name = sections[index + 1][0] if index + 1 < len(sections) else "(none - this is the last section)"
+
+    user_prompt = f"""{shared_context}
+
+{tone_guide}
+
+YOUR TASK:
+Write ONLY section {index + 1} of {len(sections)}: "{name}".
+Section instructions: {instructions}
+
+Neighbouring sections (written separately - do not cover their content):
+- Previous: {previous_name}
+- Next: {next_name}
+
+Requirements:
+- Start with the heading "## {name}" and write nothing before it
+- 250-400 words unless the section instructions say otherwise
+- Do not write an introduction or conclusion for the whole article unless this section is one
+- Use bullet points or numbered steps where the instructions call for a process
+- DO NOT include word count annotations"""
+
+    async with semaphore:
+        content = await achat_completion(
             model="gpt-4",
             messages=[
-                {"role": "system", "content": system_prompt},
+                {"role": "system", "content": "You are an expert content writer with deep industry expertise. You write one section of a larger article at a time, matching the shared outline, tone and research exactly."},
                 {"role": "user", "content": user_prompt}
             ],
             temperature=0.7,
-            max_tokens=4000
+            max_tokens=1000,
+            use_cache=False
         )
-        generated_content = response.choices[0].message.content.strip()
+
+    content = content.strip()
+    if not content.lstrip('#').strip().lower().startswith(name.lstrip('#').strip().lower()):
+        content = f"## {name}\n\n{content}"
+    return content
+
+async def _smooth_transitions(title, sections_text):
+    """
+    Consistency pass: ask for one short bridging sentence per section boundary.
+
+    Only section endings and the next heading are sent, so this stays a small,
+    fast call regardless of article length. Returns one (possibly empty)
+    sentence per boundary.
+    """
+    boundaries = []
+    for i in range(len(sections_text) - 1):
+        ending = sections_text[i].strip().split("\n\n")[-1][-600:]
+        next_heading = sections_text[i + 1].strip().split("\n", 1)[0].lstrip('# ').strip()
+        boundaries.append({"boundary": i + 1, "section_ending": ending, "next_section": next_heading})
+    if not boundaries:
+        return []
+
+    prompt = f"""The article "{title}" was written section by section. For each boundary below, write ONE short
+sentence that can be appended to the end of the section so it flows naturally into the next section.
+Keep terminology consistent and do not repeat the section ending. If no bridge is needed, use an empty string.
+
+{json.dumps(boundaries, indent=2)}
+
+Return ONLY a JSON array of {len(boundaries)} strings, in boundary order."""
+
+    try:
+        reply = await achat_completion(
+            model="gpt-4o-mini",
+            messages=[{"role": "user", "content": prompt}],
+            temperature=0.3,
+            max_tokens=60 * len(boundaries)
+        )
+        match = re.search(r'\[.*\]', reply, re.DOTALL)
+        transitions = json.loads(match.group(0)) if match else []
+        if not isinstance(transitions, list):
+            return []
+        return [str(t).strip() for t in transitions[:len(boundaries)]]
+    except Exception as e:
+        print(f"⚠️ Transition pass skipped: {e}")
+        return []
+
+async def agenerate_content_sections(topic, title, research_info, layout, content_type, tone, additional_info="", smooth_transitions=True):
+    """
+    Section-parallel variant of generate_content().
+
+    Every layout section is generated concurrently from the same shared
+    context (topic, outline, tone and research), then a small consistency
+    pass adds bridging sentences and the sections are stitched in layout
+    order. Wall-clock time is roughly that of the slowest section.
+    """
+    content_type = content_type.lower().replace(" ", "_")
+    if content_type not in ["blog", "use_case", "case_study"]:
+        raise ValueError(f"Invalid content type: {content_type}")
+
+    sections = _layout_sections(layout)
+    if not sections:
+        raise ValueError("Layout has no sections")
+
+    tone_guide = TONE_CHARACTERISTICS.get(tone.lower(), TONE_CHARACTERISTICS["professional"])
+    outline = "\n".join(f"{i + 1}. {name}" for i, (name, _) in enumerate(sections))
+    shared_context = f"""You are writing part of a {content_type.replace("_", " ")} about "{topic}" titled "{title}",
+as an industry expert with 15+ years of experience. Maintain a {tone} tone.
+
+FULL ARTICLE OUTLINE (for context):
+{outline}
+
+RESEARCHED INFORMATION:
+{research_info}
+
+ADDITIONAL INFORMATION (Provided by user - include exactly as written where relevant):
+{additional_info}"""
+
+    try:
+        print(f"Generating {len(sections)} sections in parallel for topic: {topic}, title: {title}")
+        semaphore = asyncio.Semaphore(SECTION_CONCURRENCY)
+        sections_text = await asyncio.gather(*[
+            _generate_section(i, sections, shared_context, tone_guide, semaphore)
+            for i in range(len(sections))
+        ])
+        sections_text = list(sections_text)
+
+        if smooth_transitions:
+            transitions = await _smooth_transitions(title, sections_text)
+            for i, sentence in enumerate(transitions):
+                if sentence:
+                    sections_text[i] = f"{sections_text[i].rstrip()} {sentence}"
+
+        generated_content = f"# {title}\n\n" + "\n\n".join(sections_text)
         print(f"Content generated successfully: {len(generated_content)} characters")
         return generated_content
 
     except Exception as e:
-        print(f"❌ Error in generate_content(): {e}")
+        print(f"❌ Error in agenerate_content_sections(): {e}")
         return ""
 
 # Wrapper functions for each content type
@@ -0,0 +1,233 @@
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+from datetime import date
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+import httplib2
+from googleapiclient.discovery import build
+from dotenv import load_dotenv
+from utils.disk_cache import DiskCache, cache_path
+
+# Load environment variables
+load_dotenv()
+
+# Custom Search quota settings
+CSE_MAX_CONCURRENCY = int(os.getenv("CSE_MAX_CONCURRENCY", "5"))
+CSE_QUERIES_PER_SECOND = float(os.getenv("CSE_QUERIES_PER_SECOND", "5"))
+CSE_DAILY_QUOTA = int(os.getenv("CSE_DAILY_QUOTA", "10000"))
+CSE_TIMEOUT = float(os.getenv("CSE_TIMEOUT", "15"))
+CSE_NUM_RETRIES = int(os.getenv("CSE_NUM_RETRIES", "2"))
+
+# Response cache: repeated searches for the same query and parameters use no quota
+SEARCH_CACHE_ENABLED = os.getenv("SEARCH_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+SEARCH_CACHE_TTL = float(os.getenv("SEARCH_CACHE_TTL", str(24 * 3600)))
+SEARCH_CACHE_MAX_BYTES = int(os.getenv("SEARCH_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+
+logger = logging.getLogger(__name__)
+
+
+class QuotaExceeded(Exception):
+    """Raised when the configured daily Custom Search quota is used up."""
+
+
+class QuotaLimiter:
+    """
+    Process-wide limiter for Custom Search calls.
+
+    Caps concurrent requests, spaces request starts to stay under the
+    per-second rate limit and refuses requests once the daily quota is spent.
+    """
+
+    def __init__(self, max_concurrency: int, per_second: float, daily_quota: int):
+        self._semaphore = threading.BoundedSemaphore(max(1, max_concurrency))
+        self._interval = 1.0 / per_second if per_second > 0 else 0.0
+        self.daily_quota = daily_quota
+        self._lock = threading.Lock()
+        self._next_slot = 0.0
+        self._day = date.today()
+        self._used = 0
+        self._rejected = 0
+
+    def _reserve(self):
+        """Count one query against the quota and wait for its rate-limit slot."""
+        with self._lock:
+            today = date.today()
+            if today != self._day:
+                self._day, self._used = today, 0
+            if self.daily_quota and self._used >= self.daily_quota:
+                self._rejected += 1
+                raise QuotaExceeded(f"Daily Custom Search quota of {self.daily_quota} queries reached")
+            self._used += 1
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self._interval
+        if slot > now:
+            time.sleep(slot - now)
+
+    @contextmanager
+    def acquire(self):
+        with self._semaphore:
+            self._reserve()
+            yield
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "day": self._day.isoformat(),
+                "used_today": self._used,
+                "daily_quota": self.daily_quota,
+                "rejected": self._rejected,
+            }
+
+
+_limiter = QuotaLimiter(CSE_MAX_CONCURRENCY, CSE_QUERIES_PER_SECOND, CSE_DAILY_QUOTA)
+_services: Dict[str, Any] = {}
+_services_lock = threading.Lock()
+# Idle keep-alive transports, most recently used last (see _pooled_http)
+_http_pool: List[httplib2.Http] = []
+_http_pool_lock = threading.Lock()
+_search_cache: Optional[DiskCache] = None
+_search_cache_lock = threading.Lock()
+
+
+def get_search_cache() -> Optional[DiskCache]:
+    """Return the Custom Search response cache, or None when SEARCH_CACHE_ENABLED is off."""
+    global _search_cache
+    if not SEARCH_CACHE_ENABLED:
+        return None
+    with _search_cache_lock:
+        if _search_cache is None:
+            _search_cache = DiskCache(cache_path("search_cache.sqlite3"), ttl=SEARCH_CACHE_TTL,
+                                      max_bytes=SEARCH_CACHE_MAX_BYTES)
+        return _search_cache
+
+
+def normalize_query(query: str) -> str:
+    """Query text as Custom Search treats it: case and runs of whitespace do not matter."""
+    return " ".join(query.lower().split())
+
+
+def search_cache_key(params: Dict[str, Any]) -> str:
+    """Cache key for a ``cse().list`` call: the normalized query plus every other parameter."""
+    normalized = {key: normalize_query(value) if key == "q" and isinstance(value, str) else value
+                  for key, value in params.items()}
+    payload = json.dumps(normalized, sort_keys=True, default=str)
+    return "cse:" + hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def search_cache_stats() -> Dict[str, Any]:
+    """Hit/miss statistics for the search response cache, with today's quota usage."""
+    cache = get_search_cache()
+    stats = cache.stats() if cache else {"enabled": False}
+    return {**stats, "quota": _limiter.stats()}
+
+
+def get_cse_service(api_key: str):
+    """
+    Process-wide Custom Search service for ``api_key``.
+
+    Built once from the discovery document bundled with google-api-python-client,
+    so no discovery request is made and the document is parsed only once.
+    The service object is shared; requests are executed over a pooled
+    transport (see :func:`_pooled_http`).
+    """
+    with _services_lock:
+        service = _services.get(api_key)
+        if service is None:
+            service = build(
+                "customsearch", "v1",
+                developerKey=api_key,
+                static_discovery=True,
+                cache_discovery=False,
+            )
+            _services[api_key] = service
+        return service
+
+
+@contextmanager
+def _pooled_http() -> Iterator[httplib2.Http]:
+    """
+    Check out a keep-alive HTTP transport for one request.
+
+    httplib2 connections are not thread-safe, so each request gets exclusive
+    use of one; it goes back to the pool afterwards, so its open connection
+    to the API is reused by the next query whichever thread runs it (the
+    workers of ``run_queries`` are new threads on every call). At most
+    ``CSE_MAX_CONCURRENCY`` idle transports are kept, and one that failed a
+    request is dropped rather than reused.
+    """
+    with _http_pool_lock:
+        http = _http_pool.pop() if _http_pool else None
+    if http is None:
+        http = httplib2.Http(timeout=CSE_TIMEOUT)
+    yield http
+    with _http_pool_lock:
+        if len(_http_pool) < max(1, CSE_MAX_CONCURRENCY):
+            _http_pool.append(http)
+
+
+def execute_cse(api_key: str, use_cache: bool = True, **params) -> Dict[str, Any]:
+    """
+    Run one ``cse().list`` call under the shared quota limiter.
+
+    Responses are cached for ``SEARCH_CACHE_TTL`` seconds by normalized query
+    and parameters; a cache hit returns without waiting for a rate-limit
+    slot and does not count against the quota.
+    """
+    cache = get_search_cache() if use_cache else None
+    key = search_cache_key(params) if cache else None
+    if cache:
+        cached = cache.get_json(key)
+        if cached is not None:
+            return cached
+
+    request = get_cse_service(api_key).cse().list(**params)
+    with _limiter.acquire(), _pooled_http() as http:
+        response = request.execute(http=http, num_retries=CSE_NUM_RETRIES)
+    if cache:
+        cache.set_json(key, response)
+    return response
+
+
+def run_queries(
+    queries: List[str],
+    execute: Callable[[str], Any],
+    max_workers: Optional[int] = None,
+) -> Iterator[Tuple[str, Any]]:
+    """
+    Run ``execute(query)`` for every query concurrently.
+
+    Yields ``(query, result)`` pairs in the order the calls complete. Failed
+    queries are logged and skipped.
+    """
+    if not queries:
+        return
+    workers = max(1, min(max_workers or CSE_MAX_CONCURRENCY, len(queries)))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(execute, query): query for query in queries}
+        for future in as_completed(futures):
+            query = futures[future]
+            try:
+                yield query, future.result()
+            except Exception as e:
+                logger.error(f"Search failed for query '{query}': {str(e)[:100]}")
+
+
+def unique_items(responses: Iterator[Tuple[str, Dict[str, Any]]], key: str = "link") -> List[Tuple[str, Dict[str, Any]]]:
+    """Flatten CSE responses into ``(query, item)`` pairs, dropping repeated ``key`` values in arrival order."""
+    seen = set()
+    merged = []
+    for query, response in responses:
+        for item in (response or {}).get("items", []):
+            value = item.get(key)
+            if not value or value in seen:
+                continue
+            seen.add(value)
+            merged.append((query, item))
+    return merged
@@ -0,0 +1,168 @@
+import os
+import time
+import sqlite3
+import logging
+import threading
+from urllib.parse import urlparse
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from dotenv import load_dotenv
+from utils.disk_cache import cache_path
+from utils.urls import normalize_url
+
+# Load environment variables
+load_dotenv()
+DOMAIN_REPUTATION_ENABLED = os.getenv("DOMAIN_REPUTATION_ENABLED", "true").lower() in ("1", "true", "yes")
+# Outcomes lose half their weight every half-life, so a domain that was fixed (or broke) is re-learned
+DOMAIN_REPUTATION_HALF_LIFE = float(os.getenv("DOMAIN_REPUTATION_HALF_LIFE", str(7 * 24 * 3600)))
+# A domain is skipped once it has this much (decayed) failure weight and a score below DOMAIN_REPUTATION_BAD_SCORE
+DOMAIN_REPUTATION_MIN_FAILURES = float(os.getenv("DOMAIN_REPUTATION_MIN_FAILURES", "3"))
+DOMAIN_REPUTATION_BAD_SCORE = float(os.getenv("DOMAIN_REPUTATION_BAD_SCORE", "0.25"))
+
+logger = logging.getLogger(__name__)
+
+
+def domain_of(url: str) -> str:
+    host = urlparse(normalize_url(url)).hostname or ""
+    return host[4:] if host.startswith("www.") else host
+
+
+class DomainReputation:
+    """
+    Decayed per-domain scrape success and failure counts, kept in SQLite.
+
+    ``record`` is called with every scrapeability success and page-level
+    failure (client errors, too little text; not timeouts or server errors);
+    ``score`` is the smoothed success rate ``(successes + 1) / (total + 2)``,
+    so unknown domains start at 0.5. Counts decay with ``half_life``, which
+    lets skipped domains come back once their failures are old enough.
+    """
+
+    def __init__(self, path: str, half_life: float = DOMAIN_REPUTATION_HALF_LIFE,
+                 min_failures: float = DOMAIN_REPUTATION_MIN_FAILURES,
+                 bad_score: float = DOMAIN_REPUTATION_BAD_SCORE):
+        self.half_life = half_life
+        self.min_failures = min_failures
+        self.bad_score = bad_score
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS domains (
+                domain TEXT PRIMARY KEY,
+                successes REAL NOT NULL,
+                failures REAL NOT NULL,
+                updated REAL NOT NULL,
+                last_reason TEXT
+            )"""
+        )
+        # domain -> [successes, failures, updated]; rows are loaded on first use and written through
+        self._cache: Dict[str, List[float]] = {}
+        self._stats = {"recorded": 0, "skipped": 0}
+
+    def _decayed(self, domain: str, now: float) -> List[float]:
+        """Counts for ``domain`` decayed to ``now``. Caller holds the lock."""
+        entry = self._cache.get(domain)
+        if entry is None:
+            row = self._conn.execute(
+                "SELECT successes, failures, updated FROM domains WHERE domain = ?", (domain,)
+            ).fetchone()
+            entry = list(row) if row else [0.0, 0.0, now]
+            self._cache[domain] = entry
+        if self.half_life and now > entry[2]:
+            factor = 0.5 ** ((now - entry[2]) / self.half_life)
+            entry[0] *= factor
+            entry[1] *= factor
+            entry[2] = now
+        return entry
+
+    def record(self, url: str, ok: bool, reason: str = ""):
+        domain = domain_of(url)
+        if not domain:
+            return
+        now = time.time()
+        with self._lock:
+            entry = self._decayed(domain, now)
+            entry[0 if ok else 1] += 1
+            self._conn.execute(
+                "INSERT OR REPLACE INTO domains (domain, successes, failures, updated, last_reason) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (domain, entry[0], entry[1], now, "" if ok else reason),
+            )
+            self._stats["recorded"] += 1
+
+    def counts(self, url: str) -> Tuple[float, float]:
+        with self._lock:
+            successes, failures, _ = self._decayed(domain_of(url), time.time())
+            return successes, failures
+
+    def score(self, url: str) -> float:
+        successes, failures = self.counts(url)
+        return (successes + 1) / (successes + failures + 2)
+
+    def is_bad(self, url: str) -> bool:
+        successes, failures = self.counts(url)
+        return failures >= self.min_failures and (successes + 1) / (successes + failures + 2) < self.bad_score
+
+    def rank(self, items: List[Any], key: Callable[[Any], str] = lambda item: item) -> List[Any]:
+        """
+        Drop items from known-bad domains and order the rest best domain first.
+
+        The sort is stable, so items from equally rated domains keep their
+        incoming (e.g. quality score) order.
+        """
+        kept = []
+        for item in items:
+            if self.is_bad(key(item)):
+                with self._lock:
+                    self._stats["skipped"] += 1
+                logger.info(f"Skipping {key(item)}: domain keeps failing scrapeability checks")
+                continue
+            kept.append(item)
+        scores = [self.score(key(item)) for item in kept]
+        return [item for _, item in sorted(zip(scores, kept), key=lambda pair: -pair[0])]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            domains = self._conn.execute("SELECT COUNT(*) FROM domains").fetchone()[0]
+            return {**self._stats, "domains": domains, "half_life": self.half_life}
+
+
+_reputation: Optional[DomainReputation] = None
+_reputation_lock = threading.Lock()
+
+
+def get_domain_reputation() -> Optional[DomainReputation]:
+    """Return the shared domain reputation store, or None when it is disabled or cannot be opened."""
+    global _reputation
+    if not DOMAIN_REPUTATION_ENABLED:
+        return None
+    with _reputation_lock:
+        if _reputation is None:
+            try:
+                _reputation = DomainReputation(cache_path("domain_reputation.sqlite3"))
+            except sqlite3.Error as e:
+                logger.warning(f"Domain reputation unavailable: {e}")
+                return None
+        return _reputation
+
+
+def record_outcome(url: str, ok: bool, reason: str = ""):
+    """Record one scrapeability check for the URL's domain (no-op when reputation is disabled)."""
+    reputation = get_domain_reputation()
+    if reputation is not None:
+        try:
+            reputation.record(url, ok, reason)
+        except sqlite3.Error as e:
+            logger.warning(f"Domain reputation update failed: {e}")
+
+
+def is_bad_domain(url: str) -> bool:
+    reputation = get_domain_reputation()
+    return reputation is not None and reputation.is_bad(url)
+
+
+def rank_by_domain(items: List[Any], key: Callable[[Any], str] = lambda item: item) -> List[Any]:
+    """``DomainReputation.rank`` with the shared store; returns ``items`` unchanged when disabled."""
+    reputation = get_domain_reputation()
+    return reputation.rank(items, key) if reputation is not None else list(items)
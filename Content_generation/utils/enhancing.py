@@ -1,18 +1,16 @@
-import openai
-import os
-import time
 import logging
 from dotenv import load_dotenv
-from openai.error import APIError, RateLimitError, APIConnectionError
+from utils.llm_client import chat_completion, astream_chat_completion, LLMError
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
 load_dotenv()
-openai.api_key = os.getenv("OPENAI_API_KEY")
 
-def refine_content(
+REFINE_SYSTEM_PROMPT = "You are an expert content refinement specialist. Your task is to carefully refine content while preserving its core message, tone, and structure. Follow the user's instructions precisely."
+
+def build_refine_prompt(
     generated_content: str,
     use_layout_instructions: bool,
     use_research_context: bool,
@@ -21,10 +19,7 @@ def refine_content(
     additional_instructions: str,
     tone: str,
 ) -> str:
-    # Maximum number of retries for transient errors
-    max_retries = 3
-    retry_delay = 2  # seconds
-    
+    """Build the refinement prompt shared by the blocking and streaming variants."""
     # Prepare context parts based on user's choices
     layout_part = f"Layout Instructions: {layout}" if use_layout_instructions else ""
     research_part = f"Research Context: {research_context}" if use_research_context else ""
@@ -158,63 +153,73 @@ Your final version should:
 
 Generate the final refined version of the content.
 """
+    return prompt
 
-    # Implement retry logic for transient errors
-    for attempt in range(max_retries):
-        try:
-            logger.info(f"Attempting to refine content (attempt {attempt+1}/{max_retries})")
-            
-            # Check if API key is available
-            if not openai.api_key:
-                raise ValueError("OpenAI API key is not set. Please check your environment variables.")
-            
-            # Make the API call
-            response = openai.ChatCompletion.create(
-                model="gpt-4",
-                messages=[
-                    {"role": "system", "content": 
-                    "You are an expert content refinement specialist. Your task is to carefully refine content while preserving its core message, tone, and structure. Follow the user's instructions precisely."
-                    },
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.5,  # Slightly higher temperature for more creative refinements
-                max_tokens=4000
-            )
-            
-            # Extract and validate the response
-            refined_content = response.choices[0].message.content.strip()
-            if not refined_content:
-                raise ValueError("No content was generated")
-                
-            logger.info("Content refinement successful")
-            return refined_content
-            
-        except RateLimitError as e:
-            # Handle rate limiting - wait and retry
-            wait_time = retry_delay * (attempt + 1)  # Exponential backoff
-            logger.warning(f"Rate limit exceeded. Waiting {wait_time} seconds before retry. Error: {str(e)}")
-            time.sleep(wait_time)
-            
-        except APIConnectionError as e:
-            # Handle connection issues - wait and retry
-            wait_time = retry_delay * (attempt + 1)
-            logger.warning(f"API connection error. Waiting {wait_time} seconds before retry. Error: {str(e)}")
-            time.sleep(wait_time)
-            
-        except APIError as e:
-            # Handle other API errors
-            if attempt < max_retries - 1:
-                wait_time = retry_delay * (attempt + 1)
-                logger.warning(f"API error. Waiting {wait_time} seconds before retry. Error: {str(e)}")
-                time.sleep(wait_time)
-            else:
-                logger.error(f"API error after {max_retries} attempts: {str(e)}")
-                raise Exception(f"OpenAI API error: {str(e)}")
-                
-        except Exception as e:
-            # Handle all other exceptions
-            logger.error(f"Error in refine_content: {str(e)}")
-            raise Exception(f"Error refining content: {str(e)}")
-    
-    # If we've exhausted all retries
-    raise Exception(f"Failed to refine content after {max_retries} attempts due to persistent errors")
\ No newline at end of file
+def refine_content(
+    generated_content: str,
+    use_layout_instructions: bool,
+    use_research_context: bool,
+    layout: str,
+    research_context: str,
+    additional_instructions: str,
+    tone: str,
+) -> str:
+    prompt = build_refine_prompt(
+        generated_content, use_layout_instructions, use_research_context,
+        layout, research_context, additional_instructions, tone
+    )
+
+    # Transient errors (rate limits, connection drops) are retried by the shared LLM client
+    try:
+        logger.info("Attempting to refine content")
+        refined_content = chat_completion(
+            model="gpt-4",
+            messages=[
+                {"role": "system", "content": REFINE_SYSTEM_PROMPT},
+                {"role": "user", "content": prompt}
+            ],
+            temperature=0.5,  # Slightly higher temperature for more creative refinements
+            max_tokens=4000,
+            use_cache=False
+        ).strip()
+
+        if not refined_content:
+            raise ValueError("No content was generated")
+
+        logger.info("Content refinement successful")
+        return refined_content
+
+    except LLMError as e:
+        logger.error(f"API error while refining content: {str(e)}")
+        raise Exception(f"OpenAI API error: {str(e)}")
+
+    except Exception as e:
+        # Handle all other exceptions
+        logger.error(f"Error in refine_content: {str(e)}")
+        raise Exception(f"Error refining content: {str(e)}")
+
+async def stream_refine_content(
+    generated_content: str,
+    use_layout_instructions: bool,
+    use_research_context: bool,
+    layout: str,
+    research_context: str,
+    additional_instructions: str,
+    tone: str,
+):
+    """Streaming variant of refine_content(); yields the refined text as it is generated."""
+    prompt = build_refine_prompt(
+        generated_content, use_layout_instructions, use_research_context,
+        layout, research_context, additional_instructions, tone
+    )
+    logger.info("Streaming content refinement")
+    async for delta in astream_chat_completion(
+        model="gpt-4",
+        messages=[
+            {"role": "system", "content": REFINE_SYSTEM_PROMPT},
+            {"role": "user", "content": prompt}
+        ],
+        temperature=0.5,
+        max_tokens=4000
+    ):
+        yield delta
@@ -1,10 +1,13 @@
 # utils/fallback_search.py
 
-import requests
 import re
 import random
 import time
-from bs4 import BeautifulSoup
+from utils.html_engine import parse_html
+from utils.main_content import main_paragraphs_text
+from utils.fetcher import fetch, HTML_CONTENT_TYPES
+from utils.domain_reputation import record_outcome, is_bad_domain
+from utils.seen_urls import is_permanent_failure
 
 USER_AGENTS = [
     "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36",
@@ -18,13 +21,19 @@ def get_random_user_agent():
     return random.choice(USER_AGENTS)
 
 def test_url_scrapability(url, timeout=8):
-    """Test if a URL can be scraped successfully."""
+    """
+    Test if a URL can be scraped successfully; URLs on domains that keep failing are not fetched.
+    Only page-level verdicts (client errors, too little text) count against the domain.
+    """
     try:
         if not url or not url.strip():
             return False
             
         if not url.startswith(("http://", "https://")):
             url = f"https://{url}"
+
+        if is_bad_domain(url):
+            return False
             
         headers = {
             'User-Agent': get_random_user_agent(),
@@ -35,23 +44,24 @@ def test_url_scrapability(url, timeout=8):
             'Upgrade-Insecure-Requests': '1',
         }
         
-        response = requests.get(url, headers=headers, timeout=timeout)
+        response = fetch(url, headers=headers, timeout=timeout, accept=HTML_CONTENT_TYPES)
         if response.status_code != 200:
+            if is_permanent_failure(response.status_code):
+                record_outcome(url, False, f"HTTP {response.status_code}")
             return False
             
         content_type = response.headers.get('Content-Type', '').lower()
-        if 'text/html' not in content_type:
+        if response.rejected or 'text/html' not in content_type:
             return False
             
         # Check if there's readable content
-        soup = BeautifulSoup(response.text, 'html.parser')
-        main_content = soup.find('article') or soup.find('div', class_='main-content') or soup.find('div', id='content')
-        paragraphs = main_content.find_all("p") if main_content else soup.find_all("p")
-        
-        text_content = " ".join([p.get_text() for p in paragraphs])
+        doc = parse_html(response.content, response.charset)
+        text_content = main_paragraphs_text(doc)
         
         # Return true if there's enough content
-        return len(text_content) >= 200
+        scrapable = len(text_content) >= 200
+        record_outcome(url, scrapable, "" if scrapable else "too little text")
+        return scrapable
         
     except Exception:
         return False
@@ -93,37 +103,37 @@ def fallback_search(query, num_results=10, test_scrapability=True):
         }
         
         try:
-            response = requests.get(search_url, headers=headers, timeout=10)
+            response = fetch(search_url, headers=headers, timeout=10)
             if response.status_code != 200:
                 print(f"Warning: Got status code {response.status_code} from Google")
                 # Add delay before trying next page to avoid getting blocked
                 time.sleep(random.uniform(5, 10))
                 continue
                 
-            soup = BeautifulSoup(response.text, 'html.parser')
+            doc = parse_html(response.content, response.charset)
             
             # Extract search results
-            search_divs = soup.find_all('div', class_='tF2Cxc')
+            search_divs = doc.select('div.tF2Cxc')
             if not search_divs:  # Try alternative class
-                search_divs = soup.find_all('div', class_='g')
+                search_divs = doc.select('div.g')
             
             for div in search_divs:
                 # Extract the URL
-                link_element = div.find('a')
+                link_element = div.select_first('a')
                 if not link_element:
                     continue
                     
-                url = link_element.get('href')
+                url = link_element.attr('href')
                 if not url or not url.startswith('http'):
                     continue
                 
                 # Extract the title
-                title_element = div.find('h3')
-                title = title_element.get_text() if title_element else "No title"
+                title_element = div.select_first('h3')
+                title = title_element.text() if title_element else "No title"
                 
                 # Extract the description
-                desc_element = div.find('div', class_='VwiC3b')
-                description = desc_element.get_text() if desc_element else ""
+                desc_element = div.select_first('div.VwiC3b')
+                description = desc_element.text() if desc_element else ""
                 
                 # Skip if URL already in results
                 if any(r['url'] == url for r in results):
@@ -0,0 +1,357 @@
+import os
+import time
+import hashlib
+import random
+import logging
+import threading
+from dataclasses import dataclass
+from typing import Any, BinaryIO, Callable, Dict, Optional, Sequence
+
+import httpx
+from dotenv import load_dotenv
+from utils.concurrency import HostLimiter
+from utils.disk_cache import DiskCache, cache_path
+from utils.http_cache import HttpCache, CachedResponse, HTTP_CACHE_ENABLED, HTTP_CACHE_TTL, HTTP_CACHE_MAX_BYTES
+from utils.blob_store import BlobStore, get_blob_store
+
+# Load environment variables
+load_dotenv()
+
+# Fetch policy (seconds / counts)
+FETCH_TIMEOUT = float(os.getenv("FETCH_TIMEOUT", "10"))
+FETCH_CONNECT_TIMEOUT = float(os.getenv("FETCH_CONNECT_TIMEOUT", "5"))
+FETCH_MAX_RETRIES = int(os.getenv("FETCH_MAX_RETRIES", "1"))
+FETCH_MAX_CONNECTIONS = int(os.getenv("FETCH_MAX_CONNECTIONS", "50"))
+FETCH_PER_HOST_LIMIT = int(os.getenv("FETCH_PER_HOST_LIMIT", "4"))
+FETCH_KEEPALIVE_EXPIRY = float(os.getenv("FETCH_KEEPALIVE_EXPIRY", "30"))
+# Default cap on how much of any response body is read into memory
+FETCH_MAX_BYTES = int(os.getenv("FETCH_MAX_BYTES", str(10 * 1024 * 1024)))
+
+# Content types the HTML extractors can use
+HTML_CONTENT_TYPES = ("text/html", "application/xhtml+xml")
+
+DEFAULT_HEADERS = {
+    'User-Agent': ('Mozilla/5.0 (Windows NT 10.0; Win64; x64) '
+                   'AppleWebKit/537.36 (KHTML, like Gecko) '
+                   'Chrome/91.0.4472.124 Safari/537.36'),
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,application/pdf;q=0.8,*/*;q=0.7',
+    'Accept-Language': 'en-US,en;q=0.5',
+}
+
+# Responses worth another attempt
+RETRYABLE_STATUS = {429, 502, 503, 504}
+MAX_BACKOFF = 10.0
+
+logger = logging.getLogger(__name__)
+
+
+class FetchError(Exception):
+    """Raised when a page cannot be fetched (network failure or, via raise_for_status, an HTTP error)."""
+
+
+@dataclass
+class FetchResult:
+    """A fetched page. Mirrors the parts of ``requests.Response`` the scrapers use."""
+    url: str
+    status_code: int
+    headers: httpx.Headers
+    content: bytes
+    encoding: Optional[str] = None
+    truncated: bool = False  # body was cut off at ``max_bytes`` or by a ``stop`` callback
+    rejected: bool = False  # body was not read because its content type was not accepted
+    content_hash: Optional[str] = None  # blob store key of the full body, when stored
+
+    @property
+    def ok(self) -> bool:
+        return 200 <= self.status_code < 400
+
+    @property
+    def content_type(self) -> str:
+        return self.headers.get('Content-Type', '').lower()
+
+    @property
+    def charset(self) -> Optional[str]:
+        """Explicit or header-declared charset; None lets parsers sniff it from the body."""
+        return self.encoding or self._declared_charset()
+
+    @property
+    def text(self) -> str:
+        encoding = self.charset or 'utf-8'
+        try:
+            return self.content.decode(encoding, errors='replace')
+        except LookupError:
+            return self.content.decode('utf-8', errors='replace')
+
+    def _declared_charset(self) -> Optional[str]:
+        for part in self.content_type.split(';')[1:]:
+            key, _, value = part.strip().partition('=')
+            if key == 'charset' and value:
+                return value.strip('"\'')
+        return None
+
+    def raise_for_status(self):
+        if not self.ok:
+            raise FetchError(f"HTTP {self.status_code} for URL: {self.url}")
+
+
+def accepts(content_type: str, accept: Optional[Sequence[str]]) -> bool:
+    """Whether ``content_type`` matches one of ``accept`` (a missing content type is given the benefit of the doubt)."""
+    if not accept or not content_type:
+        return True
+    content_type = content_type.lower()
+    return any(allowed in content_type for allowed in accept)
+
+
+def ensure_scheme(url: str) -> str:
+    url = url.strip()
+    if not url.startswith(("http://", "https://")):
+        url = f"https://{url}"
+    return url
+
+
+class Fetcher:
+    """
+    Shared page fetcher for every scraping path.
+
+    One pooled keep-alive ``httpx.Client`` (thread-safe) is reused for all
+    requests, concurrent requests to the same host are capped, and timeouts
+    and retries follow one policy.
+    """
+
+    def __init__(
+        self,
+        timeout: float = FETCH_TIMEOUT,
+        max_retries: int = FETCH_MAX_RETRIES,
+        max_connections: int = FETCH_MAX_CONNECTIONS,
+        per_host_limit: int = FETCH_PER_HOST_LIMIT,
+        max_bytes: Optional[int] = FETCH_MAX_BYTES,
+        cache: Optional[HttpCache] = None,
+        blobs: Optional[BlobStore] = None,
+    ):
+        self.timeout = timeout
+        self.cache = cache
+        self.blobs = blobs
+        self.max_retries = max_retries
+        self.max_bytes = max_bytes
+        self._host_limiter = HostLimiter(per_host_limit)
+        self._client = httpx.Client(
+            headers=DEFAULT_HEADERS,
+            follow_redirects=True,
+            timeout=httpx.Timeout(timeout, connect=FETCH_CONNECT_TIMEOUT),
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections,
+                keepalive_expiry=FETCH_KEEPALIVE_EXPIRY,
+            ),
+        )
+
+    @staticmethod
+    def _from_cache(entry: CachedResponse, max_bytes: Optional[int],
+                    accept: Optional[Sequence[str]] = None) -> FetchResult:
+        headers = httpx.Headers(entry.headers)
+        if not accepts(headers.get('Content-Type', ''), accept):
+            return FetchResult(url=entry.url, status_code=200, headers=headers, content=b"", rejected=True)
+        content = entry.content
+        cut = bool(max_bytes) and len(content) > max_bytes
+        return FetchResult(
+            url=entry.url,
+            status_code=200,
+            headers=headers,
+            content=content[:max_bytes] if cut else content,
+            truncated=cut or entry.partial is not None,
+            content_hash=entry.content_hash,
+        )
+
+    @staticmethod
+    def _backoff(attempt: int) -> float:
+        return min(2 ** attempt + random.uniform(0, 0.5), MAX_BACKOFF)
+
+    def _get(self, url: str, headers: Optional[Dict[str, str]], timeout: Optional[float],
+             max_bytes: Optional[int] = None, sink: Optional[BinaryIO] = None,
+             accept: Optional[Sequence[str]] = None, stop: Optional[Callable[[bytes], bool]] = None) -> FetchResult:
+        with self._host_limiter.limit(url):
+            with self._client.stream(
+                "GET", url, headers=headers,
+                timeout=httpx.Timeout(timeout or self.timeout, connect=FETCH_CONNECT_TIMEOUT)
+            ) as response:
+                # Decide on the headers alone; closing the stream unread drops the body
+                if response.status_code == 200 and not accepts(response.headers.get('Content-Type', ''), accept):
+                    return FetchResult(
+                        url=str(response.url),
+                        status_code=response.status_code,
+                        headers=response.headers,
+                        content=b"",
+                        rejected=True,
+                    )
+                if sink is not None:
+                    return self._drain_to(response, sink, max_bytes)
+                content = bytearray()
+                truncated = False
+                # Only a 200 body is worth stopping early; error pages are short and not parsed
+                if response.status_code != 200:
+                    stop = None
+                chunks = response.iter_bytes()
+                for chunk in chunks:
+                    content.extend(chunk)
+                    if max_bytes and len(content) >= max_bytes:
+                        # Closing the stream drops the rest of the body; the body is only
+                        # partial if bytes were left (checking reads at most one more chunk)
+                        truncated = len(content) > max_bytes or next(chunks, None) is not None
+                        del content[max_bytes:]
+                        break
+                    if stop is not None and stop(chunk):
+                        truncated = next(chunks, None) is not None
+                        break
+                return FetchResult(
+                    url=str(response.url),
+                    status_code=response.status_code,
+                    headers=response.headers,
+                    content=bytes(content),
+                    truncated=truncated,
+                )
+
+    @staticmethod
+    def _drain_to(response: httpx.Response, sink: BinaryIO, max_bytes: Optional[int]) -> FetchResult:
+        """Write the body to ``sink`` chunk by chunk; the result carries no content, only its hash."""
+        sink.seek(0)
+        sink.truncate()
+        digest = hashlib.sha256()
+        written = 0
+        truncated = False
+        for chunk in response.iter_bytes():
+            if max_bytes and written + len(chunk) > max_bytes:
+                chunk = chunk[:max_bytes - written]
+                truncated = True
+            sink.write(chunk)
+            digest.update(chunk)
+            written += len(chunk)
+            if truncated:
+                break
+        sink.flush()
+        return FetchResult(
+            url=str(response.url),
+            status_code=response.status_code,
+            headers=response.headers,
+            content=b"",
+            truncated=truncated,
+            content_hash=None if truncated else digest.hexdigest(),
+        )
+
+    def fetch(self, url: str, headers: Optional[Dict[str, str]] = None, timeout: Optional[float] = None,
+              max_bytes: Optional[int] = None, accept: Optional[Sequence[str]] = None,
+              stop: Optional[Callable[[bytes], bool]] = None) -> FetchResult:
+        """
+        GET ``url`` and return the response, whatever its status code.
+
+        Connection errors and 429/502/503/504 responses are retried; a
+        ``FetchError`` is raised if the page could not be reached at all.
+
+        The body is streamed and reading stops early (the result is flagged
+        ``truncated``) after ``max_bytes`` (default ``FETCH_MAX_BYTES``) or
+        once ``stop(chunk)`` returns True. With ``accept``, a 200 response
+        whose content type matches none of those substrings is returned
+        ``rejected`` without reading its body.
+
+        With an HTTP cache, fresh stored pages are returned without a request
+        and stale ones are revalidated with a conditional GET. A body cut
+        short by a ``stop`` with a ``cache_key`` attribute (such as
+        ``ParagraphTextBudget``) is cached too, but only reused by fetches
+        whose ``stop`` has the same key.
+        """
+        url = ensure_scheme(url)
+        if max_bytes is None:
+            max_bytes = self.max_bytes
+        stop_key = getattr(stop, "cache_key", None) if stop is not None else None
+        cached = self.cache.lookup(url, stop_key) if self.cache else None
+        if cached is not None and cached.is_fresh():
+            return self._from_cache(cached, max_bytes, accept)
+        if cached is not None and cached.validators():
+            headers = {**(headers or {}), **cached.validators()}
+
+        result = self._fetch(url, headers, timeout, max_bytes, accept=accept, stop=stop)
+        if result.rejected:
+            return result
+        if self.blobs and result.status_code == 200 and not result.truncated:
+            result.content_hash = self.blobs.put_url(url, result.content)
+        if self.cache:
+            if result.status_code == 304 and cached is not None:
+                entry = self.cache.revalidated(cached, list(result.headers.multi_items()))
+                return self._from_cache(entry, max_bytes, accept)
+            # A body shorter than max_bytes can only have been cut by the stop condition
+            stopped = result.truncated and not (max_bytes and len(result.content) >= max_bytes)
+            self.cache.store(url, result.status_code, list(result.headers.multi_items()),
+                             result.content, truncated=result.truncated, content_hash=result.content_hash,
+                             partial=stop_key if stopped else None)
+        return result
+
+    def download(self, url: str, sink: BinaryIO, headers: Optional[Dict[str, str]] = None,
+                 timeout: Optional[float] = None, max_bytes: Optional[int] = None) -> FetchResult:
+        """
+        GET ``url`` and stream the body into the file object ``sink`` instead of memory.
+
+        The returned result has empty ``content``; ``content_hash`` is the
+        SHA-256 of the full body (None if it was cut at ``max_bytes``).
+        Large downloads bypass the HTTP cache.
+        """
+        return self._fetch(ensure_scheme(url), headers, timeout, max_bytes, sink=sink)
+
+    def _fetch(self, url: str, headers: Optional[Dict[str, str]], timeout: Optional[float],
+               max_bytes: Optional[int], sink: Optional[BinaryIO] = None,
+               accept: Optional[Sequence[str]] = None, stop: Optional[Callable[[bytes], bool]] = None) -> FetchResult:
+        """One GET with the retry policy applied."""
+        for attempt in range(self.max_retries + 1):
+            try:
+                result = self._get(url, headers, timeout, max_bytes, sink, accept, stop)
+            except httpx.HTTPError as e:
+                if attempt >= self.max_retries:
+                    raise FetchError(f"Failed to fetch {url}: {e}") from e
+                logger.debug(f"Fetch error for {url}, retrying: {e}")
+                time.sleep(self._backoff(attempt))
+                continue
+            if result.status_code in RETRYABLE_STATUS and attempt < self.max_retries:
+                time.sleep(self._backoff(attempt))
+                continue
+            return result
+        raise FetchError(f"Failed to fetch {url}")
+
+    def close(self):
+        self._client.close()
+
+
+_fetcher: Optional[Fetcher] = None
+_fetcher_lock = threading.Lock()
+
+
+def get_fetcher() -> Fetcher:
+    """Return the process-wide fetcher, creating it on first use."""
+    global _fetcher
+    with _fetcher_lock:
+        if _fetcher is None:
+            blobs = get_blob_store()
+            cache = None
+            if HTTP_CACHE_ENABLED:
+                cache = HttpCache(
+                    DiskCache(cache_path("http_cache.sqlite3"), ttl=HTTP_CACHE_TTL, max_bytes=HTTP_CACHE_MAX_BYTES),
+                    blobs=blobs,
+                )
+            _fetcher = Fetcher(cache=cache, blobs=blobs)
+        return _fetcher
+
+
+def http_cache_stats() -> Dict[str, Any]:
+    """Hit/revalidation statistics for the page cache."""
+    cache = get_fetcher().cache
+    return cache.stats() if cache else {"enabled": False}
+
+
+def fetch(url: str, headers: Optional[Dict[str, str]] = None, timeout: Optional[float] = None,
+          max_bytes: Optional[int] = None, accept: Optional[Sequence[str]] = None,
+          stop: Optional[Callable[[bytes], bool]] = None) -> FetchResult:
+    """Fetch a page through the shared fetcher."""
+    return get_fetcher().fetch(url, headers=headers, timeout=timeout, max_bytes=max_bytes, accept=accept, stop=stop)
+
+
+def download(url: str, sink: BinaryIO, headers: Optional[Dict[str, str]] = None, timeout: Optional[float] = None,
+             max_bytes: Optional[int] = None) -> FetchResult:
+    """Stream a response body into ``sink`` through the shared fetcher."""
+    return get_fetcher().download(url, sink, headers=headers, timeout=timeout, max_bytes=max_bytes)
@@ -0,0 +1,396 @@
+import os
+import re
+import codecs
+import logging
+from abc import ABC, abstractmethod
+from typing import Iterator, List, Optional, Sequence, Union
+
+from dotenv import load_dotenv
+
+try:
+    from selectolax.lexbor import LexborHTMLParser as SelectolaxParser
+except ImportError:
+    SelectolaxParser = None
+
+try:
+    import lxml.html
+    from lxml import etree
+except ImportError:
+    lxml = None
+
+from bs4 import BeautifulSoup
+
+# Load environment variables
+load_dotenv()
+# "auto" picks the fastest installed backend: selectolax, then lxml, then BeautifulSoup's html.parser
+HTML_ENGINE = os.getenv("HTML_ENGINE", "auto").lower()
+# Paragraph text worth downloading for summarization (the summarizer reads ~4000 chars; the rest is margin)
+PAGE_TEXT_TARGET_CHARS = int(os.getenv("PAGE_TEXT_TARGET_CHARS", "12000"))
+
+# Never part of a page's readable text
+NON_CONTENT_TAGS = ("script", "style", "template")
+
+logger = logging.getLogger(__name__)
+
+Markup = Union[bytes, str]
+
+
+class Node(ABC):
+    """
+    One element of a parsed page, independent of the parsing backend.
+
+    Selectors are simple CSS: ``tag``, ``.class``, ``#id`` and combinations
+    like ``div.main-content``, optionally comma-separated. Results are in
+    document order. Backends implement the abstract methods.
+    """
+
+    tag: str = ""
+
+    @property
+    @abstractmethod
+    def key(self):
+        """Identity of the underlying element (wrappers are created per call and are not comparable)."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def attr(self, name: str, default: Optional[str] = None) -> Optional[str]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def parent(self) -> Optional["Node"]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def select(self, selector: str) -> List["Node"]:
+        raise NotImplementedError
+
+    def select_first(self, selector: str) -> Optional["Node"]:
+        found = self.select(selector)
+        return found[0] if found else None
+
+    @abstractmethod
+    def text(self, separator: str = "", strip: bool = False) -> str:
+        raise NotImplementedError
+
+    @abstractmethod
+    def children(self) -> List["Node"]:
+        """Direct child elements."""
+        raise NotImplementedError
+
+    def blocks(self, tags: Sequence[str], max_blocks: Optional[int] = None) -> Iterator["Node"]:
+        """
+        Outermost descendants whose tag is in ``tags``, in document order.
+
+        A single depth-first pass that does not descend into a matched block,
+        so nested paragraphs and lists are reported once as part of their
+        enclosing block. Stops after ``max_blocks`` blocks.
+        """
+        tags = set(tags)
+        stack = list(reversed(self.children()))
+        emitted = 0
+        while stack:
+            node = stack.pop()
+            if node.tag in tags:
+                yield node
+                emitted += 1
+                if max_blocks and emitted >= max_blocks:
+                    return
+                continue
+            stack.extend(reversed(node.children()))
+
+    def remove(self, tags: Sequence[str]):
+        """Drop every descendant element with one of these tag names."""
+        for node in self.select(", ".join(tags)):
+            node.decompose()
+
+    @abstractmethod
+    def decompose(self):
+        raise NotImplementedError
+
+
+class Document(Node):
+    """A parsed page. ``title`` and ``body`` mirror BeautifulSoup's ``soup.title`` / ``soup.body``."""
+
+    engine: str = ""
+
+    @property
+    def title(self) -> Optional[str]:
+        node = self.select_first("title")
+        return node.text(strip=True) if node is not None else None
+
+    @property
+    def body(self) -> Optional[Node]:
+        return self.select_first("body")
+
+
+_META_CHARSET = re.compile(rb'<meta[^>]+charset=["\']?([\w.:-]+)', re.IGNORECASE)
+
+
+def _charset(markup: Markup, declared: Optional[str]) -> Optional[str]:
+    """Usable charset for byte markup: the declared one, else a <meta> charset, else utf-8."""
+    if not isinstance(markup, bytes):
+        return None
+    candidates = [declared]
+    match = _META_CHARSET.search(markup[:4096])
+    if match:
+        candidates.append(match.group(1).decode("ascii", errors="ignore"))
+    for candidate in candidates:
+        if not candidate:
+            continue
+        try:
+            return codecs.lookup(candidate).name
+        except LookupError:
+            continue
+    return "utf-8"
+
+
+def _join_text(strings: Iterator[str], separator: str, strip: bool) -> str:
+    if strip:
+        return separator.join(s.strip() for s in strings if s and s.strip())
+    return separator.join(s for s in strings if s)
+
+
+# --- selectolax ---
+
+class _SelectolaxNode(Node):
+    def __init__(self, node):
+        self._node = node
+        self.tag = node.tag or ""
+
+    @property
+    def key(self):
+        return self._node.mem_id
+
+    def attr(self, name, default=None):
+        value = self._node.attributes.get(name)
+        return default if value is None else value
+
+    def parent(self):
+        parent = self._node.parent
+        return _SelectolaxNode(parent) if parent is not None and parent.tag and not parent.tag.startswith("-") else None
+
+    def select(self, selector):
+        return [_SelectolaxNode(n) for n in self._node.css(selector)]
+
+    def select_first(self, selector):
+        node = self._node.css_first(selector)
+        return _SelectolaxNode(node) if node is not None else None
+
+    def text(self, separator="", strip=False):
+        if not separator and not strip:
+            return self._node.text(deep=True)
+        strings = (n.text_content for n in self._node.traverse(include_text=True) if n.tag == "-text")
+        return _join_text(strings, separator, strip)
+
+    def children(self):
+        return [_SelectolaxNode(n) for n in self._node.iter(include_text=False)
+                if n.tag and not n.tag.startswith(("-", "_", "!"))]
+
+    def decompose(self):
+        self._node.decompose()
+
+
+class _SelectolaxDocument(_SelectolaxNode, Document):
+    engine = "selectolax"
+
+    def __init__(self, markup: Markup, encoding: Optional[str]):
+        if isinstance(markup, bytes) and encoding:
+            markup = markup.decode(encoding, errors="replace")
+        self._tree = SelectolaxParser(markup)
+        self._tree.strip_tags(list(NON_CONTENT_TAGS))
+        super().__init__(self._tree.root if self._tree.root is not None else SelectolaxParser("<html></html>").root)
+
+
+# --- lxml ---
+
+_SIMPLE_SELECTOR = re.compile(r"^([a-zA-Z][\w-]*|\*)?((?:[.#][\w-]+)*)$")
+_SELECTOR_PART = re.compile(r"([.#])([\w-]+)")
+
+
+def _css_to_xpath(selector: str) -> str:
+    """Translate the simple selectors described on :class:`Node` to a descendant XPath."""
+    paths = []
+    for part in selector.split(","):
+        part = part.strip()
+        match = _SIMPLE_SELECTOR.match(part)
+        if not part or not match:
+            raise ValueError(f"Unsupported selector: {part!r}")
+        conditions = []
+        for kind, name in _SELECTOR_PART.findall(match.group(2)):
+            if kind == ".":
+                conditions.append(f"contains(concat(' ', normalize-space(@class), ' '), ' {name} ')")
+            else:
+                conditions.append(f"@id='{name}'")
+        path = f"descendant::{(match.group(1) or '*').lower()}"
+        if conditions:
+            path += f"[{' and '.join(conditions)}]"
+        paths.append(path)
+    return " | ".join(paths)
+
+
+class _LxmlNode(Node):
+    def __init__(self, element):
+        self._element = element
+        self.tag = element.tag if isinstance(element.tag, str) else ""
+
+    @property
+    def key(self):
+        return self._element
+
+    def attr(self, name, default=None):
+        return self._element.get(name, default)
+
+    def parent(self):
+        parent = self._element.getparent()
+        return _LxmlNode(parent) if parent is not None else None
+
+    def select(self, selector):
+        return [_LxmlNode(e) for e in self._element.xpath(_css_to_xpath(selector))]
+
+    def text(self, separator="", strip=False):
+        return _join_text(self._element.itertext(), separator, strip)
+
+    def children(self):
+        return [_LxmlNode(e) for e in self._element.iterchildren() if isinstance(e.tag, str)]
+
+    def decompose(self):
+        # drop_tree keeps the tail text, like removing a tag from the document
+        self._element.drop_tree()
+
+
+class _LxmlDocument(_LxmlNode, Document):
+    engine = "lxml"
+
+    def __init__(self, markup: Markup, encoding: Optional[str]):
+        parser = lxml.html.HTMLParser(encoding=encoding) if isinstance(markup, bytes) and encoding else None
+        try:
+            root = lxml.html.document_fromstring(markup, parser=parser)
+        except (etree.ParserError, ValueError):
+            # Empty or unparseable page
+            root = lxml.html.document_fromstring("<html><body></body></html>")
+        etree.strip_elements(root, etree.Comment, *NON_CONTENT_TAGS, with_tail=False)
+        super().__init__(root)
+
+
+# --- BeautifulSoup (html.parser), the original behavior ---
+
+class _SoupNode(Node):
+    def __init__(self, element):
+        self._element = element
+        self.tag = element.name or ""
+
+    @property
+    def key(self):
+        # Tags compare by content, so identity has to come from the object itself
+        return id(self._element)
+
+    def attr(self, name, default=None):
+        value = self._element.get(name, default)
+        # bs4 returns multi-valued attributes (class) as lists
+        return " ".join(value) if isinstance(value, list) else value
+
+    def parent(self):
+        parent = self._element.parent
+        return _SoupNode(parent) if parent is not None and parent.name != "[document]" else None
+
+    def select(self, selector):
+        return [_SoupNode(e) for e in self._element.select(selector)]
+
+    def select_first(self, selector):
+        element = self._element.select_one(selector)
+        return _SoupNode(element) if element is not None else None
+
+    def text(self, separator="", strip=False):
+        return self._element.get_text(separator=separator, strip=strip)
+
+    def children(self):
+        return [_SoupNode(e) for e in self._element.find_all(True, recursive=False)]
+
+    def decompose(self):
+        self._element.decompose()
+
+
+class _SoupDocument(_SoupNode, Document):
+    engine = "bs4"
+
+    def __init__(self, markup: Markup, encoding: Optional[str]):
+        soup = BeautifulSoup(markup, "html.parser", from_encoding=encoding if isinstance(markup, bytes) else None)
+        for element in soup(list(NON_CONTENT_TAGS)):
+            element.decompose()
+        super().__init__(soup)
+
+
+_ENGINES = {
+    "selectolax": (_SelectolaxDocument, SelectolaxParser is not None),
+    "lxml": (_LxmlDocument, lxml is not None),
+    "bs4": (_SoupDocument, True),
+}
+
+
+def available_engines() -> List[str]:
+    return [name for name, (_, installed) in _ENGINES.items() if installed]
+
+
+def _engine_class(engine: Optional[str]):
+    name = (engine or HTML_ENGINE).lower()
+    if name != "auto":
+        document_class, installed = _ENGINES.get(name, (None, False))
+        if installed:
+            return document_class
+        logger.warning(f"HTML engine '{name}' is not available, falling back to auto")
+    return _ENGINES[available_engines()[0]][0]
+
+
+def parse_html(markup: Markup, encoding: Optional[str] = None, engine: Optional[str] = None) -> Document:
+    """
+    Parse a page with the configured engine.
+
+    Pass the raw response bytes (and the charset from the response headers,
+    if any) so the backend decodes them itself instead of going through
+    ``response.text`` first.
+    """
+    markup = markup or b""
+    return _engine_class(engine)(markup, _charset(markup, encoding))
+
+
+_TAG = re.compile(rb"<(/?)([a-zA-Z][a-zA-Z0-9]*)[^>]*>")
+_MAX_CARRY = 1024
+
+
+class ParagraphTextBudget:
+    """
+    Stop condition for streamed HTML downloads (``fetch(..., stop=...)``).
+
+    Fed the body chunk by chunk, it keeps a rough running count of the text
+    inside ``<p>`` elements without parsing the page and reports True once
+    ``target_chars`` have been seen. The count is approximate (tags split
+    across chunks are carried over, unclosed paragraphs end at the next
+    ``<p>``), so pick a target with some margin over what is actually used.
+    Bodies it cuts short are cached under ``cache_key`` and reused by later
+    fetches with the same target.
+    """
+
+    def __init__(self, target_chars: int):
+        self.target_chars = target_chars
+        self.cache_key = f"paragraph-text:{target_chars}"
+        self.chars = 0
+        self._in_paragraph = False
+        self._carry = b""
+
+    def __call__(self, chunk: bytes) -> bool:
+        data = self._carry + chunk
+        self._carry = b""
+        # Keep a trailing, still-open tag for the next chunk
+        cut = data.rfind(b"<")
+        if cut != -1 and data.find(b">", cut) == -1 and len(data) - cut <= _MAX_CARRY:
+            data, self._carry = data[:cut], data[cut:]
+        position = 0
+        for match in _TAG.finditer(data):
+            if self._in_paragraph:
+                self.chars += len(data[position:match.start()].strip())
+            if match.group(2).lower() == b"p":
+                self._in_paragraph = not match.group(1)
+            position = match.end()
+        if self._in_paragraph:
+            self.chars += len(data[position:].strip())
+        return self.chars >= self.target_chars
@@ -0,0 +1,220 @@
+import os
+import json
+import time
+import hashlib
+import threading
+from dataclasses import dataclass, field
+from email.utils import parsedate_to_datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from dotenv import load_dotenv
+from utils.disk_cache import DiskCache
+from utils.blob_store import BlobStore
+
+# Load environment variables
+load_dotenv()
+HTTP_CACHE_ENABLED = os.getenv("HTTP_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+# How long a stored page is kept for revalidation, whatever its freshness
+HTTP_CACHE_TTL = float(os.getenv("HTTP_CACHE_TTL", str(7 * 24 * 3600)))
+HTTP_CACHE_MAX_BYTES = int(os.getenv("HTTP_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+# Minimum freshness for HTML/PDF pages; overrides short max-age and no-cache (not no-store). 0 follows the server.
+HTTP_CACHE_CONTENT_FRESHNESS = float(os.getenv("HTTP_CACHE_CONTENT_FRESHNESS", "3600"))
+
+CONTENT_TYPES = ("text/html", "application/xhtml", "application/pdf")
+# Headers that describe a message body on the wire, not the decoded body we store
+BODY_HEADERS = {"content-length", "content-encoding", "transfer-encoding"}
+
+
+def parse_cache_control(value: str) -> Dict[str, Optional[str]]:
+    """``"max-age=60, no-cache"`` -> ``{"max-age": "60", "no-cache": None}``."""
+    directives = {}
+    for part in value.split(","):
+        name, _, arg = part.strip().partition("=")
+        if name:
+            directives[name.lower()] = arg.strip('"') or None
+    return directives
+
+
+def _http_date(value: Optional[str]) -> Optional[float]:
+    if not value:
+        return None
+    try:
+        return parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError, IndexError):
+        return None
+
+
+@dataclass
+class CachedResponse:
+    """A stored 200 response and what is needed to decide whether it can be reused."""
+    url: str
+    headers: List[Tuple[str, str]]
+    content: bytes
+    fresh_until: float
+    stored_at: float = field(default_factory=time.time)
+    content_hash: Optional[str] = None
+    # ``cache_key`` of the stop condition that cut the body short; None for a complete body
+    partial: Optional[str] = None
+
+    def header(self, name: str) -> Optional[str]:
+        name = name.lower()
+        for key, value in self.headers:
+            if key.lower() == name:
+                return value
+        return None
+
+    def usable_for(self, stop_key: Optional[str] = None) -> bool:
+        """Whether a fetch whose stop condition has ``stop_key`` can use this body."""
+        return self.partial is None or self.partial == stop_key
+
+    def is_fresh(self, now: Optional[float] = None) -> bool:
+        return (now or time.time()) < self.fresh_until
+
+    def validators(self) -> Dict[str, str]:
+        """Conditional request headers for revalidating this response."""
+        conditions = {}
+        etag = self.header("ETag")
+        last_modified = self.header("Last-Modified")
+        if etag:
+            conditions["If-None-Match"] = etag
+        if last_modified:
+            conditions["If-Modified-Since"] = last_modified
+        return conditions
+
+
+class HttpCache:
+    """
+    On-disk HTTP cache for page fetches.
+
+    Responses are reused while fresh according to Cache-Control / Expires
+    (with a configurable minimum freshness for content pages) and are
+    revalidated with conditional GETs once stale, so an unchanged page costs
+    a 304 instead of a full download. With a blob store, entries keep only
+    the body's hash and the bytes live (deduplicated) in the store.
+    """
+
+    def __init__(self, cache: DiskCache, content_freshness: float = HTTP_CACHE_CONTENT_FRESHNESS,
+                 blobs: Optional[BlobStore] = None):
+        self.cache = cache
+        self.content_freshness = content_freshness
+        self.blobs = blobs
+        self._lock = threading.Lock()
+        self._stats = {"fresh_hits": 0, "revalidated": 0, "stored": 0, "stored_partial": 0, "uncacheable": 0}
+
+    @staticmethod
+    def _key(url: str) -> str:
+        return hashlib.sha256(url.encode("utf-8")).hexdigest()
+
+    def _count(self, name: str):
+        with self._lock:
+            self._stats[name] += 1
+
+    def _freshness(self, headers: List[Tuple[str, str]], content_type: str, now: float) -> Optional[float]:
+        """Seconds the response stays fresh, or None if it must not be stored."""
+        values = {key.lower(): value for key, value in headers}
+        directives = parse_cache_control(values.get("cache-control", ""))
+        if "no-store" in directives:
+            return None
+        lifetime = 0.0
+        if "no-cache" not in directives:
+            if directives.get("max-age", "").isdigit():
+                lifetime = float(directives["max-age"])
+            else:
+                expires = _http_date(values.get("expires"))
+                if expires is not None:
+                    lifetime = max(0.0, expires - (_http_date(values.get("date")) or now))
+        if content_type.startswith(CONTENT_TYPES):
+            lifetime = max(lifetime, self.content_freshness)
+        return lifetime
+
+    def _write(self, entry: CachedResponse):
+        meta = {
+            "url": entry.url,
+            "headers": entry.headers,
+            "fresh_until": entry.fresh_until,
+            "stored_at": entry.stored_at,
+            "blob": entry.content_hash if self.blobs else None,
+            "partial": entry.partial,
+        }
+        body = b"" if meta["blob"] else entry.content
+        # json.dumps escapes control characters, so a NUL safely separates metadata from the body
+        self.cache.set(self._key(entry.url), json.dumps(meta).encode("utf-8") + b"\0" + body)
+
+    def lookup(self, url: str, stop_key: Optional[str] = None) -> Optional[CachedResponse]:
+        """The stored response for ``url``, unless it is a partial body the caller cannot use."""
+        value = self.cache.get(self._key(url))
+        if value is None:
+            return None
+        meta, _, content = value.partition(b"\0")
+        try:
+            meta = json.loads(meta)
+        except ValueError:
+            return None
+        if meta.get("blob"):
+            content = self.blobs.get(meta["blob"]) if self.blobs else None
+            if content is None:  # body was garbage-collected from the blob store
+                return None
+        entry = CachedResponse(
+            url=meta["url"],
+            headers=[tuple(pair) for pair in meta["headers"]],
+            content=content,
+            fresh_until=meta["fresh_until"],
+            stored_at=meta["stored_at"],
+            content_hash=meta.get("blob"),
+            partial=meta.get("partial"),
+        )
+        if not entry.usable_for(stop_key):
+            return None
+        if entry.is_fresh():
+            self._count("fresh_hits")
+        return entry
+
+    def store(self, url: str, status_code: int, headers: List[Tuple[str, str]], content: bytes,
+              truncated: bool = False, content_hash: Optional[str] = None,
+              partial: Optional[str] = None) -> Optional[CachedResponse]:
+        """
+        Store a 200 response if its headers allow it.
+
+        A ``truncated`` body is only stored with ``partial``, the ``cache_key``
+        of the stop condition that cut it short, and is then only returned to
+        lookups with the same key.
+        """
+        if status_code != 200 or (truncated and not partial):
+            return None
+        now = time.time()
+        # The body is stored decoded, so length/encoding headers no longer apply
+        headers = [(key, value) for key, value in headers if key.lower() not in BODY_HEADERS]
+        content_type = dict((key.lower(), value) for key, value in headers).get("content-type", "").lower()
+        lifetime = self._freshness(headers, content_type, now)
+        if lifetime is None:
+            self.cache.delete(self._key(url))
+            self._count("uncacheable")
+            return None
+        entry = CachedResponse(url=url, headers=headers, content=content, fresh_until=now + lifetime,
+                               stored_at=now, content_hash=None if truncated else content_hash,
+                               partial=partial if truncated else None)
+        self._write(entry)
+        self._count("stored_partial" if entry.partial else "stored")
+        return entry
+
+    def revalidated(self, entry: CachedResponse, headers: List[Tuple[str, str]]) -> CachedResponse:
+        """Refresh a stored response after a 304, taking the updated headers from it."""
+        now = time.time()
+        headers = [(key, value) for key, value in headers if key.lower() not in BODY_HEADERS]
+        updated = {key.lower() for key, _ in headers}
+        merged = [(key, value) for key, value in entry.headers if key.lower() not in updated] + headers
+        content_type = (entry.header("Content-Type") or "").lower()
+        lifetime = self._freshness(merged, content_type, now)
+        entry = CachedResponse(
+            url=entry.url, headers=merged, content=entry.content,
+            fresh_until=now + (lifetime or 0.0), stored_at=now, content_hash=entry.content_hash,
+            partial=entry.partial,
+        )
+        self._write(entry)
+        self._count("revalidated")
+        return entry
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counters = dict(self._stats)
+        return {**self.cache.stats(), **counters}
@@ -1,15 +1,18 @@
-import requests
-from bs4 import BeautifulSoup
+from utils.html_engine import parse_html
+from utils.main_content import find_main_content
+import os
 import json
-import openai
 
 from dotenv import load_dotenv
-
-import requests
-from bs4 import BeautifulSoup
+from utils.llm_client import chat_completion
+from utils.fetcher import fetch, HTML_CONTENT_TYPES
 
 load_dotenv()
 
+# Structural blocks collected from a page, and how many of them at most
+LAYOUT_BLOCK_TAGS = ('h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'ul', 'ol', 'p')
+LAYOUT_MAX_BLOCKS = int(os.getenv("LAYOUT_MAX_BLOCKS", "400"))
+
 class LayoutExtractor:
     def __init__(self):
         self.headers = {
@@ -17,25 +20,24 @@ class LayoutExtractor:
                            'AppleWebKit/537.36 (KHTML, like Gecko) '
                            'Chrome/91.0.4472.124 Safari/537.36')
         }
-    def extract_layout(self, url, research_context: str = ""):
+    def extract_layout(self, url, research_context: str = "", max_blocks: int = LAYOUT_MAX_BLOCKS):
         """Extract document structure and generate layout instructions to be used for content generation."""
         try:
-            response = requests.get(url, headers=self.headers, timeout=10)
+            response = fetch(url, headers=self.headers, timeout=10, accept=HTML_CONTENT_TYPES)
             if response.status_code != 200:
                 print(f"Error: Received status code {response.status_code} for URL: {url}")
                 return None
+            if response.rejected:
+                print(f"Error: Not an HTML page ({response.content_type}) for URL: {url}")
+                return None
             
-            soup = BeautifulSoup(response.content, 'html.parser')
+            doc = parse_html(response.content, response.charset)
             
             # Remove unwanted tags
-            for tag in soup(["script", "style", "nav", "footer", "header", "noscript"]):
-                tag.decompose()
+            doc.remove(["script", "style", "nav", "footer", "header", "noscript"])
             
-            # Try multiple selectors to find the main content
-            main_content = (soup.find('article') or 
-                          soup.find('div', class_='main-content') or 
-                          soup.find('div', id='main') or 
-                          soup.body)
+            # Pick the densest text container, or the whole body when nothing stands out
+            main_content = find_main_content(doc) or doc.body
             
             if not main_content:
                 print("Error: No main content container found.")
@@ -56,29 +58,31 @@ class LayoutExtractor:
             transition_words = {'however', 'therefore', 'furthermore', 'moreover', 'consequently', 
                               'additionally', 'in addition', 'first', 'second', 'finally', 'in conclusion'}
             
-            for element in main_content.find_all(recursive=True):
+            # One pass over the container: each heading, list and paragraph is visited once,
+            # and paragraphs/lists nested inside a list belong to that list's items
+            for element in main_content.blocks(LAYOUT_BLOCK_TAGS, max_blocks=max_blocks):
                 element_data = None
-                if element.name in ['h1', 'h2', 'h3', 'h4', 'h5', 'h6']:
-                    text = element.get_text().strip()
+                if element.tag in ['h1', 'h2', 'h3', 'h4', 'h5', 'h6']:
+                    text = element.text().strip()
                     if text:
                         element_data = {
                             'type': 'heading',
-                            'level': element.name.upper(),
+                            'level': element.tag.upper(),
                             'text': text,
                             'position': len(structure) + 1
                         }
-                elif element.name in ['ul', 'ol']:
-                    items = [li.get_text().strip() for li in element.find_all('li')]
+                elif element.tag in ['ul', 'ol']:
+                    items = [li.text().strip() for li in element.children() if li.tag == 'li']
                     if items:
                         element_data = {
                             'type': 'list',
-                            'list_type': 'unordered' if element.name == 'ul' else 'ordered',
+                            'list_type': 'unordered' if element.tag == 'ul' else 'ordered',
                             'items': items,
                             'position': len(structure) + 1
                         }
                         writing_style['formatting'].add('lists')
-                elif element.name == 'p':
-                    text = element.get_text().strip()
+                elif element.tag == 'p':
+                    text = element.text().strip()
                     if text:
                         # Analyze writing style
                         sentences = text.split('. ')
@@ -155,7 +159,7 @@ class LayoutExtractor:
             Return only the JSON array.
             """
 
-            response = openai.ChatCompletion.create(
+            layout_text = chat_completion(
                 model="gpt-4",
                 messages=[
                     {"role": "system", "content": "You are an expert at analyzing content structure and creating detailed layout templates that preserve writing style."},
@@ -166,7 +170,7 @@ class LayoutExtractor:
 
             try:
                 # Parse the GPT response into JSON
-                layout_json = json.loads(response.choices[0].message.content.strip())
+                layout_json = json.loads(layout_text.strip())
                 
                 # Ensure it's a list of dictionaries with 'section' and 'content' keys
                 if not isinstance(layout_json, list):
@@ -295,15 +299,14 @@ class LayoutExtractor:
             """
         
         try:
-            response = openai.ChatCompletion.create(
+            layout_text = chat_completion(
                 model='gpt-4',
                 messages=[
                     {"role": "system", "content": "You are an expert at analyzing content structure and creating detailed layout templates."},
                     {"role": "user", "content": prompt}
                 ],
                 temperature=0.3
-            )
-            layout_text = response.choices[0].message.content.strip()
+            ).strip()
             try:
                 layout_json = json.loads(layout_text)
                 
@@ -495,12 +498,11 @@ class LayoutExtractor:
             raise ValueError(f"Unsupported content type: {content_type}")
 
         # Send the prompt to OpenAI GPT-4
-        chat = openai.ChatCompletion.create(
+        layout_text = chat_completion(
             model="gpt-4",
             messages=[{"role":"user","content":prompt}],
             temperature=0.4
-        )
-        layout_text = chat.choices[0].message.content.strip()
+        ).strip()
         try:
             layout_json = json.loads(layout_text)
             return layout_json
@@ -1,19 +1,24 @@
 import os
 import re
 import logging
-import requests
-import pdfplumber
-from urllib.parse import urlparse, urlunparse, parse_qs, urlencode
 from dataclasses import dataclass, asdict
 from typing import List, Dict, Set, Optional, Tuple, Any
 from concurrent.futures import ThreadPoolExecutor, as_completed
 import argparse
 from datetime import datetime
-from bs4 import BeautifulSoup
+from utils.html_engine import parse_html
+from utils.main_content import find_main_content
+from utils.near_duplicates import new_duplicate_index
+from utils.seen_urls import RejectedURLIndex, get_rejected_urls, is_permanent_failure
+from utils.query_memo import get_query_memo
 
-import openai
-from googleapiclient.discovery import build
 from dotenv import load_dotenv
+from utils.llm_client import chat_completion
+from utils.custom_search import execute_cse, run_queries
+from utils.fetcher import fetch, HTML_CONTENT_TYPES
+from utils.pdf_text import pdf_text_from_url
+from utils.urls import normalize_url
+from utils.research_store import get_research_store
 
 # Load environment variables
 load_dotenv()
@@ -38,23 +43,33 @@ class SearchResult:
     relevance_reasons: List[str] = None
 
 class SeenURLStore:
-    def __init__(self):
+    """
+    URLs already handled by this search, plus the ones past searches rejected.
+
+    ``contains`` is true for URLs added during this search and for URLs in
+    the shared rejected index, so recurring searches do not fetch pages that
+    failed last time. ``mark_rejected`` records a failure for later searches.
+    """
+
+    def __init__(self, rejected: Optional[RejectedURLIndex] = None):
         self._seen: Set[str] = set()
+        self.rejected = rejected
 
     def _normalize(self, url: str) -> str:
-        parsed = urlparse(url)
-        qs = parse_qs(parsed.query, keep_blank_values=True)
-        for key in list(qs):
-            if key.lower().startswith(('utm_', 'ref', 'fbclid')):
-                del qs[key]
-        new_query = urlencode(qs, doseq=True)
-        return urlunparse(parsed._replace(query=new_query))
+        return normalize_url(url)
 
     def add(self, url: str):
         self._seen.add(self._normalize(url))
 
     def contains(self, url: str) -> bool:
-        return self._normalize(url) in self._seen
+        if self._normalize(url) in self._seen:
+            return True
+        return self.rejected is not None and self.rejected.contains(url)
+
+    def mark_rejected(self, url: str, reason: str = ""):
+        self.add(url)
+        if self.rejected is not None:
+            self.rejected.add(url, reason)
 
 class LLMQueryGenerator:
     def __init__(self, model: str = 'gpt-4'):
@@ -64,7 +79,14 @@ class LLMQueryGenerator:
             '-site:youtube.com'
         ]
 
-    def generate(self, topic: str) -> List[str]:
+    def generate(self, topic: str, used: List[str] = ()) -> List[str]:
+        """Search queries for ``topic``, memoized per topic; pass ``used`` queries to get further ones."""
+        queries = get_query_memo().next_batch(
+            "internet_search", topic, lambda existing: self._generate(topic, existing), used=used, batch=5
+        )
+        return [f'{q} {" ".join(self.domain_exclusions)} filetype:pdf|html' for q in queries]
+
+    def _generate(self, topic: str, existing: List[str]) -> List[str]:
         prompt = f"""Generate 5 technical Google search queries for "{topic}".
         Include these elements:
         1. Expand acronyms (e.g., AR → Augmented Reality , AI → Artificial Intelligence)
@@ -73,15 +95,16 @@ class LLMQueryGenerator:
         4. Focus on recent implementations (2019-2025)
         
         Format as: ["query 1", "query 2"]"""
+        if existing:
+            prompt += "\n\nDo not repeat any of these queries:\n" + "\n".join(f"- {q}" for q in existing)
         
-        response = openai.ChatCompletion.create(
+        content = chat_completion(
             model=self.model,
             messages=[{"role": "user", "content": prompt}],
             temperature=0.5
         )
         
-        queries = self._parse_queries(response.choices[0].message.content)
-        return [f'{q} {" ".join(self.domain_exclusions)} filetype:pdf|html' for q in queries]
+        return self._parse_queries(content)
 
     def _parse_queries(self, text: str) -> List[str]:
         try:
@@ -91,7 +114,7 @@ class LLMQueryGenerator:
 
 class GoogleSearcher:
     def __init__(self, api_key: str, cx: str, seen_store: SeenURLStore):
-        self.service = build('customsearch', 'v1', developerKey=api_key)
+        self.api_key = api_key
         self.cx = cx
         self.seen = seen_store
         self.content_indicators = {
@@ -114,13 +137,11 @@ class GoogleSearcher:
             ])
         }
 
+        # Dispatch all queries at once; responses are merged (and deduplicated) as they arrive
         results = []
-        for query in queries:
-            try:
-                resp = self.service.cse().list(q=query, **params).execute()
-                results.extend(self._process_response(resp))
-            except Exception as e:
-                logger.error(f"Search error: {str(e)[:100]}")
+        responses = run_queries(queries, lambda query: execute_cse(self.api_key, q=query, **params))
+        for _, resp in responses:
+            results.extend(self._process_response(resp))
         return results
 
     def _process_response(self, resp: dict) -> List[SearchResult]:
@@ -147,9 +168,13 @@ class ContentAnalyzer:
     def __init__(self):
         self.headers = {'User-Agent': 'TechnicalResearchBot/1.0'}
         self.timeout = 10
-        self.retries = 2
 
     def extract_content(self, url: str) -> Dict[str, Any]:
+        """
+        Extract a page's text. Failed results carry a ``rejection`` reason
+        only when the page itself is unusable (client error, content type,
+        too little text), never for network or server errors.
+        """
         content = {'success': False, 'content': '', 'published_date': None}
         
         try:
@@ -163,35 +188,43 @@ class ContentAnalyzer:
     def _process_pdf(self, url: str) -> Dict[str, Any]:
         content = {'success': False, 'content': ''}
         try:
-            response = requests.get(url, headers=self.headers, timeout=self.timeout)
-            with pdfplumber.open(response.content) as pdf:
-                content['content'] = '\n'.join(page.extract_text() for page in pdf.pages)
-                content['success'] = len(content['content']) > 500
+            # Streamed to a temp file and parsed page by page up to the page/character limits
+            content['content'] = pdf_text_from_url(url, headers=self.headers)
+            content['success'] = len(content['content']) > 500
+            if not content['success']:
+                content['rejection'] = "too little text"
             return content
         except Exception as e:
             raise ValueError(f"PDF processing error: {str(e)}")
 
     def _process_html(self, url: str) -> Dict[str, Any]:
         content = {'success': False, 'content': ''}
-        for _ in range(self.retries):
-            try:
-                response = requests.get(url, headers=self.headers, timeout=self.timeout)
-                if response.status_code != 200:
-                    continue
-
-                soup = BeautifulSoup(response.text, 'html.parser')
-                main_content = soup.find(['article', 'main']) or soup.body
-                text = main_content.get_text(separator='\n', strip=True)
-                
-                if any(s in text.lower() for s in ['sign in', 'subscribe']):
-                    raise ValueError("Paywalled content detected")
-
-                content['content'] = text
-                content['success'] = len(text) > 1000
-                return content
-            except Exception as e:
-                continue
-        raise ValueError(f"HTML processing failed after {self.retries} attempts")
+        # Transient network errors are retried by the shared fetcher
+        response = fetch(url, headers=self.headers, timeout=self.timeout, accept=HTML_CONTENT_TYPES)
+        if response.status_code != 200:
+            if is_permanent_failure(response.status_code):
+                return {**content, 'rejection': f"HTTP {response.status_code}"}
+            raise ValueError(f"HTML processing failed: HTTP {response.status_code}")
+        if response.rejected:
+            # The body was not downloaded; PDFs served from extension-less URLs go to the PDF path
+            if 'application/pdf' in response.content_type:
+                return self._process_pdf(url)
+            return {**content, 'rejection': f"unsupported content type {response.content_type}"}
+
+        doc = parse_html(response.content, response.charset)
+        main_content = find_main_content(doc) or doc.body
+        if main_content is None:
+            raise ValueError("HTML processing failed: no body")
+        text = main_content.text(separator='\n', strip=True)
+
+        if any(s in text.lower() for s in ['sign in', 'subscribe']):
+            raise ValueError("Paywalled content detected")
+
+        content['content'] = text
+        content['success'] = len(text) > 1000
+        if not content['success']:
+            content['rejection'] = "too little text"
+        return content
 
 class RelevanceScorer:
     def __init__(self):
@@ -240,11 +273,11 @@ class RelevanceScorer:
         KEYWORDS: comma,separated,terms
         TECHNICAL_TERMS: comma,separated,terms"""
         
-        response = openai.ChatCompletion.create(
+        content = chat_completion(
             model="gpt-3.5-turbo",
             messages=[{"role": "user", "content": prompt}]
         )
-        return self._parse_analysis(response.choices[0].message.content)
+        return self._parse_analysis(content)
 
     def _parse_analysis(self, text: str) -> Dict[str, list]:
         return {
@@ -257,18 +290,21 @@ class RelevanceScorer:
         return [t.strip().lower() for t in match.group(1).split(',')] if match else []
 
 class SearchCoordinator:
-    def __init__(self, topic: str, num_results: int = 5):
+    def __init__(self, topic: str, num_results: int = 5, session_id: Optional[str] = None):
         self.topic = topic
         self.num_results = num_results
-        self.seen_store = SeenURLStore()
+        self.session_id = session_id
+        self.seen_store = SeenURLStore(get_rejected_urls())
         self.query_generator = LLMQueryGenerator()
         self.searcher = GoogleSearcher(GOOGLE_API_KEY, GOOGLE_CX, self.seen_store)
         self.content_analyzer = ContentAnalyzer()
         self.relevance_scorer = RelevanceScorer()
+        self.duplicates = new_duplicate_index()
 
     def run(self) -> List[Dict]:
         queries = self.query_generator.generate(self.topic)
         search_results = self.searcher.search(queries)
+        self.duplicates = new_duplicate_index([result.href for result in search_results])
         
         processed_results = []
         for result in search_results:
@@ -284,8 +320,24 @@ class SearchCoordinator:
         try:
             content = self.content_analyzer.extract_content(result.href)
             if not content['success']:
+                # Transient fetch errors carry no rejection and are retried by later searches
+                if content.get('rejection'):
+                    self.seen_store.mark_rejected(result.href, content['rejection'])
+                return None
+
+            # Mirrored and syndicated copies would fill the results with the same text
+            original = self.duplicates.check(result.href, content['content'])
+            if original:
+                logger.info(f"Skipping {result.href}: near-duplicate of {original}")
                 return None
 
+            # Keep the extracted text so the summarize stage does not fetch the page again
+            if self.session_id:
+                get_research_store().put(
+                    self.session_id, result.href,
+                    title=result.title, text=content['content'], topic=self.topic
+                )
+
             score, reasons = self.relevance_scorer.calculate_score(
                 content['content'], self.topic, result.published
             )
@@ -294,6 +346,7 @@ class SearchCoordinator:
             result.relevance_reasons = reasons
             return asdict(result)
         except Exception as e:
+            # Scoring and LLM errors say nothing about the page, so nothing is recorded
             logger.warning(f"Processing failed for {result.href}: {str(e)[:100]}")
             return None
 
@@ -313,7 +366,7 @@ if __name__ == '__main__':
         print(f"   Reasons: {', '.join(res['relevance_reasons'])}\n")
         
 
-def get_final_result(topic: str, num_results: int = 5) -> list:
+def get_final_result(topic: str, num_results: int = 5, session_id: Optional[str] = None) -> list:
     """
     Compatibility function to match the interface of the old search_engine.py
     Returns list of results with same structure as the old function:
@@ -327,7 +380,7 @@ def get_final_result(topic: str, num_results: int = 5) -> list:
         ...
     ]
     """
-    coordinator = SearchCoordinator(topic=topic, n_results=num_results)
+    coordinator = SearchCoordinator(topic=topic, num_results=num_results, session_id=session_id)
     results = coordinator.run()
     
     # Format results to match the old interface
@@ -342,7 +395,7 @@ def get_final_result(topic: str, num_results: int = 5) -> list:
     
     return formatted_results
 
-def search_topic(topic: str, num_results: int = 10) -> List[Dict]:
+def search_topic(topic: str, num_results: int = 10, session_id: Optional[str] = None) -> List[Dict]:
     """
     Main function to search for content about a topic.
     This function is a compatibility wrapper around get_final_result.
@@ -350,13 +403,14 @@ def search_topic(topic: str, num_results: int = 10) -> List[Dict]:
     Args:
         topic (str): The topic to search for
         num_results (int): Maximum number of results to return
+        session_id (str): Research session that keeps extracted pages for the summarize stage
         
     Returns:
         List[Dict]: List of search results with title, URL, and snippet
     """
     try:
         # Use the new search functionality
-        results = get_final_result(topic, num_results)
+        results = get_final_result(topic, num_results, session_id=session_id)
         
         # Format results to match the expected interface
         formatted_results = []
@@ -0,0 +1,370 @@
+import os
+import json
+import time
+import hashlib
+import random
+import asyncio
+import logging
+import threading
+import weakref
+from typing import List, Dict, Optional, Any, AsyncIterator
+
+import httpx
+from dotenv import load_dotenv
+from utils.disk_cache import DiskCache, cache_path
+
+# Load environment variables
+load_dotenv()
+OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1")
+
+# Client tuning (seconds / counts)
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "120"))
+LLM_CONNECT_TIMEOUT = float(os.getenv("LLM_CONNECT_TIMEOUT", "10"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "3"))
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "20"))
+LLM_KEEPALIVE_EXPIRY = float(os.getenv("LLM_KEEPALIVE_EXPIRY", "60"))
+
+# Prompt/response cache
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", str(7 * 24 * 3600)))
+LLM_CACHE_MAX_BYTES = int(os.getenv("LLM_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+
+# Status codes worth another attempt (rate limits, overload, gateway errors)
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+MAX_BACKOFF = 30.0
+
+logger = logging.getLogger(__name__)
+
+
+class LLMError(Exception):
+    """Raised when an OpenAI request fails and cannot be retried."""
+
+
+class LLMClient:
+    """
+    Shared OpenAI client with pooled keep-alive connections.
+
+    Synchronous callers share one thread-safe ``httpx.Client``; coroutines get
+    an ``httpx.AsyncClient`` bound to their running event loop. Both paths use
+    the same timeout and retry policy. Chat completions are served from a
+    persistent prompt/response cache unless the caller passes ``use_cache=False``.
+    """
+
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        base_url: str = OPENAI_BASE_URL,
+        timeout: float = LLM_TIMEOUT,
+        max_retries: int = LLM_MAX_RETRIES,
+        max_connections: int = LLM_MAX_CONNECTIONS,
+        cache: Optional[DiskCache] = None,
+    ):
+        self.cache = cache
+        self.api_key = api_key or OPENAI_API_KEY
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_connections,
+            keepalive_expiry=LLM_KEEPALIVE_EXPIRY,
+        )
+        self._sync_client: Optional[httpx.Client] = None
+        self._async_clients: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+    # ------------------- transport -------------------
+
+    def _headers(self) -> Dict[str, str]:
+        if not self.api_key:
+            raise LLMError("OpenAI API key is not set. Please check your environment variables.")
+        return {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json",
+        }
+
+    def _timeout(self, timeout: Optional[float]) -> httpx.Timeout:
+        return httpx.Timeout(timeout or self.timeout, connect=LLM_CONNECT_TIMEOUT)
+
+    def _get_sync_client(self) -> httpx.Client:
+        with self._lock:
+            if self._sync_client is None:
+                self._sync_client = httpx.Client(
+                    base_url=self.base_url,
+                    limits=self.limits,
+                    timeout=self._timeout(None),
+                )
+            return self._sync_client
+
+    def _get_async_client(self) -> httpx.AsyncClient:
+        loop = asyncio.get_running_loop()
+        client = self._async_clients.get(loop)
+        if client is None:
+            client = httpx.AsyncClient(
+                base_url=self.base_url,
+                limits=self.limits,
+                timeout=self._timeout(None),
+            )
+            self._async_clients[loop] = client
+        return client
+
+    # ------------------- retry policy -------------------
+
+    def _backoff(self, attempt: int, response: Optional[httpx.Response] = None) -> float:
+        """Seconds to wait before the next attempt, honouring Retry-After."""
+        if response is not None:
+            retry_after = response.headers.get("Retry-After")
+            try:
+                if retry_after is not None:
+                    return min(float(retry_after), MAX_BACKOFF)
+            except ValueError:
+                pass
+        return min(2 ** attempt + random.uniform(0, 1), MAX_BACKOFF)
+
+    @staticmethod
+    def _error_message(response: httpx.Response) -> str:
+        try:
+            return response.json().get("error", {}).get("message", response.text)
+        except ValueError:
+            return response.text
+
+    def _check(self, response: httpx.Response, attempt: int) -> bool:
+        """Return True when the response is good, False when it should be retried."""
+        if response.status_code < 400:
+            return True
+        if response.status_code in RETRYABLE_STATUS and attempt < self.max_retries:
+            logger.warning(
+                f"OpenAI returned HTTP {response.status_code}, retrying "
+                f"(attempt {attempt + 1}/{self.max_retries})"
+            )
+            return False
+        raise LLMError(f"OpenAI API error (HTTP {response.status_code}): {self._error_message(response)}")
+
+    def request(self, path: str, payload: Dict[str, Any], timeout: Optional[float] = None) -> Dict[str, Any]:
+        """POST ``payload`` to ``path`` with retries, blocking the calling thread only."""
+        client = self._get_sync_client()
+        for attempt in range(self.max_retries + 1):
+            try:
+                response = client.post(path, json=payload, headers=self._headers(), timeout=self._timeout(timeout))
+            except httpx.TransportError as e:
+                if attempt >= self.max_retries:
+                    raise LLMError(f"OpenAI connection error: {e}") from e
+                logger.warning(f"OpenAI connection error, retrying: {e}")
+                time.sleep(self._backoff(attempt))
+                continue
+            if self._check(response, attempt):
+                return response.json()
+            time.sleep(self._backoff(attempt, response))
+        raise LLMError(f"OpenAI request failed after {self.max_retries} retries")
+
+    async def arequest(self, path: str, payload: Dict[str, Any], timeout: Optional[float] = None) -> Dict[str, Any]:
+        """Async counterpart of :meth:`request`; never blocks the event loop."""
+        client = self._get_async_client()
+        for attempt in range(self.max_retries + 1):
+            try:
+                response = await client.post(path, json=payload, headers=self._headers(), timeout=self._timeout(timeout))
+            except httpx.TransportError as e:
+                if attempt >= self.max_retries:
+                    raise LLMError(f"OpenAI connection error: {e}") from e
+                logger.warning(f"OpenAI connection error, retrying: {e}")
+                await asyncio.sleep(self._backoff(attempt))
+                continue
+            if self._check(response, attempt):
+                return response.json()
+            await asyncio.sleep(self._backoff(attempt, response))
+        raise LLMError(f"OpenAI request failed after {self.max_retries} retries")
+
+    # ------------------- chat completions -------------------
+
+    @staticmethod
+    def _chat_payload(
+        messages: List[Dict[str, str]],
+        model: str,
+        temperature: Optional[float],
+        max_tokens: Optional[int],
+    ) -> Dict[str, Any]:
+        payload: Dict[str, Any] = {"model": model, "messages": messages}
+        if temperature is not None:
+            payload["temperature"] = temperature
+        if max_tokens is not None:
+            payload["max_tokens"] = max_tokens
+        return payload
+
+    @staticmethod
+    def _cache_key(payload: Dict[str, Any]) -> str:
+        key_fields = {k: payload.get(k) for k in ("model", "messages", "temperature", "max_tokens")}
+        return hashlib.sha256(json.dumps(key_fields, sort_keys=True).encode("utf-8")).hexdigest()
+
+    def _cached(self, payload: Dict[str, Any], use_cache: bool) -> Optional[str]:
+        if not (use_cache and self.cache):
+            return None
+        value = self.cache.get(self._cache_key(payload))
+        return value.decode("utf-8") if value is not None else None
+
+    def _store(self, payload: Dict[str, Any], content: str, use_cache: bool):
+        if use_cache and self.cache and content:
+            self.cache.set(self._cache_key(payload), content)
+
+    @staticmethod
+    def _content(data: Dict[str, Any]) -> str:
+        try:
+            return data["choices"][0]["message"]["content"] or ""
+        except (KeyError, IndexError, TypeError) as e:
+            raise LLMError(f"Unexpected completion response: {data}") from e
+
+    def chat(
+        self,
+        messages: List[Dict[str, str]],
+        model: str = "gpt-4",
+        temperature: Optional[float] = None,
+        max_tokens: Optional[int] = None,
+        timeout: Optional[float] = None,
+        use_cache: bool = True,
+    ) -> str:
+        """Run a chat completion and return the assistant message text."""
+        payload = self._chat_payload(messages, model, temperature, max_tokens)
+        cached = self._cached(payload, use_cache)
+        if cached is not None:
+            return cached
+        content = self._content(self.request("/chat/completions", payload, timeout))
+        self._store(payload, content, use_cache)
+        return content
+
+    async def achat(
+        self,
+        messages: List[Dict[str, str]],
+        model: str = "gpt-4",
+        temperature: Optional[float] = None,
+        max_tokens: Optional[int] = None,
+        timeout: Optional[float] = None,
+        use_cache: bool = True,
+    ) -> str:
+        """Async chat completion returning the assistant message text."""
+        payload = self._chat_payload(messages, model, temperature, max_tokens)
+        cached = self._cached(payload, use_cache)
+        if cached is not None:
+            return cached
+        content = self._content(await self.arequest("/chat/completions", payload, timeout))
+        self._store(payload, content, use_cache)
+        return content
+
+    async def astream_chat(
+        self,
+        messages: List[Dict[str, str]],
+        model: str = "gpt-4",
+        temperature: Optional[float] = None,
+        max_tokens: Optional[int] = None,
+        timeout: Optional[float] = None,
+    ) -> AsyncIterator[str]:
+        """
+        Stream a chat completion, yielding content deltas as they arrive.
+
+        Failures before the first token are retried like any other request;
+        once tokens have been yielded an error is raised as ``LLMError``.
+        Streamed responses are never cached.
+        """
+        payload = self._chat_payload(messages, model, temperature, max_tokens)
+        payload["stream"] = True
+        client = self._get_async_client()
+        started = False
+        for attempt in range(self.max_retries + 1):
+            delay = None
+            try:
+                async with client.stream(
+                    "POST", "/chat/completions", json=payload,
+                    headers=self._headers(), timeout=self._timeout(timeout)
+                ) as response:
+                    if response.status_code >= 400:
+                        await response.aread()
+                        self._check(response, attempt)  # raises when not retryable
+                        delay = self._backoff(attempt, response)
+                    else:
+                        async for line in response.aiter_lines():
+                            if not line.startswith("data:"):
+                                continue
+                            data = line[len("data:"):].strip()
+                            if data == "[DONE]":
+                                return
+                            try:
+                                delta = json.loads(data)["choices"][0].get("delta", {}).get("content")
+                            except (ValueError, KeyError, IndexError) as e:
+                                raise LLMError(f"Unexpected stream chunk: {data}") from e
+                            if delta:
+                                started = True
+                                yield delta
+                        return
+            except httpx.TransportError as e:
+                if started or attempt >= self.max_retries:
+                    raise LLMError(f"OpenAI connection error: {e}") from e
+                logger.warning(f"OpenAI connection error, retrying: {e}")
+                delay = self._backoff(attempt)
+            await asyncio.sleep(delay)
+        raise LLMError(f"OpenAI request failed after {self.max_retries} retries")
+
+    # ------------------- embeddings -------------------
+
+    def embed(
+        self,
+        texts: List[str],
+        model: str = "text-embedding-ada-002",
+        timeout: Optional[float] = None,
+    ) -> List[List[float]]:
+        """Embed all ``texts`` in a single batched request, preserving input order."""
+        if not texts:
+            return []
+        data = self.request("/embeddings", {"model": model, "input": texts}, timeout)
+        try:
+            items = sorted(data["data"], key=lambda item: item["index"])
+            return [item["embedding"] for item in items]
+        except (KeyError, TypeError) as e:
+            raise LLMError(f"Unexpected embedding response: {data}") from e
+
+    def close(self):
+        with self._lock:
+            if self._sync_client is not None:
+                self._sync_client.close()
+                self._sync_client = None
+
+
+_client: Optional[LLMClient] = None
+_client_lock = threading.Lock()
+
+
+def get_llm_client() -> LLMClient:
+    """Return the process-wide LLM client, creating it on first use."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            cache = None
+            if LLM_CACHE_ENABLED:
+                cache = DiskCache(cache_path("llm_cache.sqlite3"), ttl=LLM_CACHE_TTL, max_bytes=LLM_CACHE_MAX_BYTES)
+            _client = LLMClient(cache=cache)
+        return _client
+
+
+def chat_completion(messages: List[Dict[str, str]], model: str = "gpt-4", **kwargs) -> str:
+    """Blocking chat completion through the shared client."""
+    return get_llm_client().chat(messages, model=model, **kwargs)
+
+
+async def achat_completion(messages: List[Dict[str, str]], model: str = "gpt-4", **kwargs) -> str:
+    """Non-blocking chat completion through the shared client."""
+    return await get_llm_client().achat(messages, model=model, **kwargs)
+
+
+async def astream_chat_completion(messages: List[Dict[str, str]], model: str = "gpt-4", **kwargs) -> AsyncIterator[str]:
+    """Token stream of a chat completion through the shared client."""
+    async for delta in get_llm_client().astream_chat(messages, model=model, **kwargs):
+        yield delta
+
+
+def embed_texts(texts: List[str], model: str = "text-embedding-ada-002", **kwargs) -> List[List[float]]:
+    """Batched embeddings through the shared client."""
+    return get_llm_client().embed(texts, model=model, **kwargs)
+
+
+def llm_cache_stats() -> Dict[str, Any]:
+    """Hit/miss statistics for the prompt/response cache."""
+    cache = get_llm_client().cache
+    return cache.stats() if cache else {"enabled": False}
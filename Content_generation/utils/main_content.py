@@ -0,0 +1,189 @@
+import re
+from typing import Dict, List, Optional, Tuple
+
+from utils.html_engine import Node
+
+# Class/id hints, in the spirit of Mozilla's Readability
+POSITIVE_HINTS = re.compile(
+    r"article|body|content|entry|hentry|h-entry|main|page|post|text|blog|story|prose", re.IGNORECASE
+)
+NEGATIVE_HINTS = re.compile(
+    r"comment|com-|contact|footer|footnote|masthead|media|meta|nav|outbrain|promo|related|scroll|share|"
+    r"shoutbox|sidebar|skyscraper|sponsor|shopping|tags|tool|widget|menu|breadcrumb|banner|cookie|subscribe|"
+    r"newsletter|popup|modal|ad-|ads|advert",
+    re.IGNORECASE,
+)
+
+TAG_WEIGHTS = {
+    "article": 10, "main": 10, "section": 3, "div": 5,
+    "pre": 3, "td": 3, "blockquote": 3,
+    "address": -3, "ol": -3, "ul": -3, "dl": -3, "dd": -3, "dt": -3, "li": -3, "form": -3,
+    "h1": -5, "h2": -5, "h3": -5, "h4": -5, "h5": -5, "h6": -5, "th": -5,
+    "nav": -25, "aside": -25, "footer": -25, "header": -15,
+}
+
+# Elements whose own text counts as a content paragraph
+PARAGRAPH_SELECTOR = "p, pre, td, blockquote"
+MIN_PARAGRAPH_CHARS = 25
+# Below this the page has no real article and callers fall back to their old behaviour
+MIN_TOP_SCORE = 20.0
+# Candidates scoring at least max(MIN_RELATED_SCORE, RELATED_SCORE_RATIO * top) belong to the same article
+# (Readability's sibling threshold)
+MIN_RELATED_SCORE = 10.0
+RELATED_SCORE_RATIO = 0.2
+# Elements that declare where the page's content is; a winner inside one is widened to it
+CONTENT_LANDMARKS = ("article", "main")
+
+
+def class_weight(node: Node) -> int:
+    weight = 0
+    for name in ("class", "id"):
+        value = node.attr(name) or ""
+        if not value:
+            continue
+        if NEGATIVE_HINTS.search(value):
+            weight -= 25
+        if POSITIVE_HINTS.search(value):
+            weight += 25
+    return weight
+
+
+def link_density(node: Node, text_length: Optional[int] = None) -> float:
+    """Share of a node's text that sits inside links (navigation and link lists score close to 1)."""
+    if text_length is None:
+        text_length = len(node.text(strip=True))
+    if not text_length:
+        return 0.0
+    link_length = sum(len(a.text(strip=True)) for a in node.select("a"))
+    return min(1.0, link_length / text_length)
+
+
+def _in_boilerplate(node: Node, depth: int = 6) -> bool:
+    """Whether the paragraph sits inside nav/aside/footer chrome (checked a few levels up)."""
+    current = node.parent()
+    while current is not None and depth > 0:
+        if current.tag in ("nav", "aside", "footer"):
+            return True
+        current = current.parent()
+        depth -= 1
+    return False
+
+
+def score_candidates(doc: Node) -> Dict[object, Tuple[Node, float]]:
+    """
+    Readability-style content scores for the containers of the page's paragraphs.
+
+    Each paragraph with enough text adds ``1 + commas + min(len / 100, 3)``
+    to its parent and half of that to its grandparent. Containers start from
+    a tag and class/id weight, and final scores are scaled by
+    ``1 - link_density`` so link-heavy chrome loses to prose.
+    """
+    candidates: Dict[object, Tuple[Node, float]] = {}
+
+    def initial(node: Node) -> float:
+        return TAG_WEIGHTS.get(node.tag, 0) + class_weight(node)
+
+    for paragraph in doc.select(PARAGRAPH_SELECTOR):
+        text = paragraph.text(strip=True)
+        if len(text) < MIN_PARAGRAPH_CHARS or _in_boilerplate(paragraph):
+            continue
+        score = 1 + text.count(",") + min(len(text) / 100, 3)
+        parent = paragraph.parent()
+        for ancestor, share in ((parent, 1.0), (parent.parent() if parent is not None else None, 0.5)):
+            if ancestor is None or ancestor.tag in ("html", "body"):
+                continue
+            node, total = candidates.get(ancestor.key, (ancestor, initial(ancestor)))
+            candidates[ancestor.key] = (node, total + score * share)
+
+    for key, (node, total) in candidates.items():
+        candidates[key] = (node, total * (1 - link_density(node)))
+    return candidates
+
+
+def _ancestry(node: Node) -> List[Node]:
+    """``node`` and its ancestors, outermost first."""
+    chain = [node]
+    parent = node.parent()
+    while parent is not None:
+        chain.append(parent)
+        parent = parent.parent()
+    chain.reverse()
+    return chain
+
+
+def _merge_related(top: Node, top_score: float, candidates: Dict[object, Tuple[Node, float]]) -> Node:
+    """
+    Widen the top candidate to the whole article it belongs to.
+
+    Paragraph scores only reach parents and grandparents, so in a sectioned
+    article every section's inner ``div`` is a separate candidate and the
+    winner is just one of them. Like Readability's sibling step, candidates
+    scoring at least ``max(MIN_RELATED_SCORE, RELATED_SCORE_RATIO * top)``
+    count as part of the same article and the result is their lowest common
+    ancestor (never ``<body>``: then the top candidate is kept). A result
+    inside an ``<article>`` or ``<main>`` is widened to it.
+    """
+    threshold = max(MIN_RELATED_SCORE, RELATED_SCORE_RATIO * top_score)
+    chain = _ancestry(top)
+    common = len(chain)
+    for node, score in candidates.values():
+        if score < threshold or node.key == top.key:
+            continue
+        other = _ancestry(node)
+        shared = 0
+        while shared < min(common, len(other)) and chain[shared].key == other[shared].key:
+            shared += 1
+        common = shared
+    container = chain[common - 1] if common else top
+    if container.tag in ("html", "body"):
+        container = top
+
+    for ancestor in reversed(_ancestry(container)):
+        if ancestor.tag in CONTENT_LANDMARKS:
+            return ancestor
+    return container
+
+
+def find_main_content(doc: Node, min_score: float = MIN_TOP_SCORE) -> Optional[Node]:
+    """
+    The element that most likely holds the page's article text, or None.
+
+    Replaces the fixed ``article`` / ``div.main-content`` / ``div#content``
+    cascades: every extractor asks this first and keeps its previous
+    fallback (usually the whole page or ``<body>``) for pages without a
+    clear winner.
+    """
+    candidates = score_candidates(doc)
+    if not candidates:
+        return None
+    node, score = max(candidates.values(), key=lambda item: item[1])
+    if score < min_score:
+        return None
+    return _merge_related(node, score, candidates)
+
+
+def _outermost(nodes: List[Node]) -> List[Node]:
+    """``nodes`` without the ones nested inside another of them (a ``<p>`` in a ``<blockquote>``)."""
+    keys = {node.key for node in nodes}
+    kept = []
+    for node in nodes:
+        parent = node.parent()
+        while parent is not None and parent.key not in keys:
+            parent = parent.parent()
+        if parent is None:
+            kept.append(node)
+    return kept
+
+
+def main_paragraphs_text(doc: Node, separator: str = " ") -> str:
+    """
+    Joined text of the paragraph elements (the ones scoring counts) inside
+    the main content, or of every ``<p>`` when there is no main content or
+    it yields no text.
+    """
+    container = find_main_content(doc)
+    if container is not None:
+        text = separator.join(node.text() for node in _outermost(container.select(PARAGRAPH_SELECTOR)))
+        if text.strip():
+            return text
+    return separator.join(p.text() for p in doc.select("p"))
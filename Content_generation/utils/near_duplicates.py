@@ -0,0 +1,214 @@
+import os
+import re
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from typing import AbstractSet, Dict, Iterable, List, Optional, Tuple
+
+from dotenv import load_dotenv
+from utils.disk_cache import cache_path
+from utils.urls import normalize_url
+
+# Load environment variables
+load_dotenv()
+# Pages whose 64-bit SimHash fingerprints differ in at most this many bits count as the same text
+NEAR_DUPLICATE_MAX_DISTANCE = int(os.getenv("NEAR_DUPLICATE_MAX_DISTANCE", "3"))
+# Also match against pages kept from past searches (off by default)
+NEAR_DUPLICATE_HISTORY = os.getenv("NEAR_DUPLICATE_HISTORY", "false").lower() in ("1", "true", "yes")
+NEAR_DUPLICATE_HISTORY_TTL = float(os.getenv("NEAR_DUPLICATE_HISTORY_TTL", str(30 * 24 * 3600)))
+
+SHINGLE_SIZE = 3
+# Too few shingles give unstable fingerprints; such pages are never treated as duplicates
+MIN_SHINGLES = 20
+FINGERPRINT_BITS = 64
+
+logger = logging.getLogger(__name__)
+
+_WORD = re.compile(r"\w+")
+
+
+def simhash(text: str, shingle_size: int = SHINGLE_SIZE) -> Optional[int]:
+    """64-bit SimHash of the word shingles of ``text``, or None when the text is too short."""
+    words = _WORD.findall(text.lower())
+    shingles = {" ".join(words[i:i + shingle_size]) for i in range(max(0, len(words) - shingle_size + 1))}
+    if len(shingles) < MIN_SHINGLES:
+        return None
+    counts = [0] * FINGERPRINT_BITS
+    for shingle in shingles:
+        value = int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest(), "big")
+        for bit in range(FINGERPRINT_BITS):
+            counts[bit] += 1 if value >> bit & 1 else -1
+    return sum(1 << bit for bit, count in enumerate(counts) if count > 0)
+
+
+def hamming_distance(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+def bands(fingerprint: int, max_distance: int) -> List[int]:
+    """
+    Split a fingerprint into ``max_distance + 1`` bit ranges.
+
+    Two fingerprints within ``max_distance`` bits of each other must agree
+    exactly on at least one range, so ranges work as lookup keys.
+    """
+    count = max_distance + 1
+    width = FINGERPRINT_BITS // count
+    result = []
+    for index in range(count):
+        start = index * width
+        stop = FINGERPRINT_BITS if index == count - 1 else start + width
+        result.append(fingerprint >> start & ((1 << (stop - start)) - 1))
+    return result
+
+
+class FingerprintHistory:
+    """
+    Fingerprints of pages kept by past searches, stored in SQLite.
+
+    Each page is recorded under its normalized URL, so a page never matches
+    its own earlier fingerprint; only other URLs carrying the same text do.
+    """
+
+    def __init__(self, path: str, max_distance: int = NEAR_DUPLICATE_MAX_DISTANCE,
+                 ttl: Optional[float] = NEAR_DUPLICATE_HISTORY_TTL):
+        self.path = path
+        self.max_distance = max_distance
+        self.ttl = ttl
+        self._bands = max_distance + 1
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        band_columns = ", ".join(f"band{i} INTEGER NOT NULL" for i in range(self._bands))
+        self._conn.execute(
+            f"""CREATE TABLE IF NOT EXISTS fingerprints (
+                url TEXT PRIMARY KEY,
+                fingerprint TEXT NOT NULL,
+                {band_columns},
+                created REAL NOT NULL
+            )"""
+        )
+        for i in range(self._bands):
+            self._conn.execute(f"CREATE INDEX IF NOT EXISTS fingerprints_band{i} ON fingerprints(band{i})")
+
+    def match(self, fingerprint: int, url: str, among: AbstractSet[str]) -> Optional[str]:
+        """
+        URL of an earlier page within ``max_distance`` bits of ``fingerprint``,
+        other than ``url`` itself, limited to the normalized URLs in ``among``.
+        """
+        key = normalize_url(url)
+        where = " OR ".join(f"band{i} = ?" for i in range(self._bands))
+        now = time.time()
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT url, fingerprint, created FROM fingerprints WHERE {where}",
+                bands(fingerprint, self.max_distance),
+            ).fetchall()
+        matched = None
+        for other_url, other, created in rows:
+            if self.ttl and now - created > self.ttl:
+                continue
+            if hamming_distance(fingerprint, int(other, 16)) > self.max_distance:
+                continue
+            if other_url == key:
+                # This page is the one its copies were matched against before
+                return None
+            if other_url in among:
+                matched = matched or other_url
+        return matched
+
+    def add(self, fingerprint: int, url: str):
+        values = bands(fingerprint, self.max_distance)
+        columns = ", ".join(f"band{i}" for i in range(self._bands))
+        placeholders = ", ".join("?" for _ in values)
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO fingerprints (url, fingerprint, {columns}, created) "
+                f"VALUES (?, ?, {placeholders}, ?)",
+                (normalize_url(url), format(fingerprint, "016x"), *values, now),
+            )
+            if self.ttl:
+                self._conn.execute("DELETE FROM fingerprints WHERE created < ?", (now - self.ttl,))
+
+
+class NearDuplicateIndex:
+    """
+    SimHash index of the pages seen by one search.
+
+    ``check`` fingerprints a page's text and returns the URL of an earlier
+    page with (nearly) the same text, so syndicated and mirrored copies can
+    be dropped before they are summarized. Safe to share between threads;
+    the first copy to be checked is the one that is kept.
+
+    With a ``history`` and the ``urls`` of the current run, a page also
+    counts as a copy when a past search kept another page with the same
+    text and that page is part of this run too, so the copy kept last time
+    is kept again whichever is checked first. Originals outside the run
+    never cause a drop, since this run would lose the content.
+    """
+
+    def __init__(self, max_distance: int = NEAR_DUPLICATE_MAX_DISTANCE,
+                 history: Optional[FingerprintHistory] = None, urls: Optional[Iterable[str]] = None):
+        self.max_distance = max_distance
+        self.history = history
+        self._run_urls = frozenset(normalize_url(url) for url in urls or () if url)
+        self._lock = threading.Lock()
+        self._urls: Dict[int, str] = {}
+        self._bands: List[Dict[int, List[int]]] = [{} for _ in range(max_distance + 1)]
+        self.duplicates: List[Tuple[str, str]] = []
+
+    def _match(self, fingerprint: int, key: str) -> Optional[str]:
+        for table, value in zip(self._bands, bands(fingerprint, self.max_distance)):
+            for other in table.get(value, ()):
+                if self._urls[other] != key and hamming_distance(fingerprint, other) <= self.max_distance:
+                    return self._urls[other]
+        return None
+
+    def check(self, url: str, text: str) -> Optional[str]:
+        """Record ``url`` and return None, or return the URL it duplicates (which keeps it out of the index)."""
+        fingerprint = simhash(text)
+        if fingerprint is None:
+            return None
+        key = normalize_url(url)
+        with self._lock:
+            original = self._match(fingerprint, key)
+            if original is None and self.history is not None and self._run_urls:
+                try:
+                    original = self.history.match(fingerprint, url, self._run_urls)
+                except sqlite3.Error as e:
+                    logger.warning(f"Fingerprint history lookup failed: {e}")
+            if original is not None:
+                self.duplicates.append((url, original))
+                return original
+            self._urls[fingerprint] = key
+            for table, value in zip(self._bands, bands(fingerprint, self.max_distance)):
+                table.setdefault(value, []).append(fingerprint)
+        if self.history is not None:
+            try:
+                self.history.add(fingerprint, url)
+            except sqlite3.Error as e:
+                logger.warning(f"Fingerprint history update failed: {e}")
+        return None
+
+
+_history: Optional[FingerprintHistory] = None
+_history_lock = threading.Lock()
+
+
+def get_fingerprint_history() -> Optional[FingerprintHistory]:
+    """Return the shared fingerprint history, or None when NEAR_DUPLICATE_HISTORY is off."""
+    global _history
+    if not NEAR_DUPLICATE_HISTORY:
+        return None
+    with _history_lock:
+        if _history is None:
+            _history = FingerprintHistory(cache_path("fingerprints.sqlite3"))
+        return _history
+
+
+def new_duplicate_index(urls: Optional[Iterable[str]] = None) -> NearDuplicateIndex:
+    """A fresh index for one search over ``urls``, backed by the fingerprint history when it is enabled."""
+    return NearDuplicateIndex(history=get_fingerprint_history(), urls=urls)
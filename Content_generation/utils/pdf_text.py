@@ -0,0 +1,292 @@
+import os
+import mmap
+import time
+import logging
+import tempfile
+import threading
+import multiprocessing
+from dataclasses import dataclass, field
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from dotenv import load_dotenv
+from utils.fetcher import FetchError, download
+from utils.blob_store import derived_text
+
+try:
+    import pdfplumber
+except ImportError:
+    pdfplumber = None
+
+try:
+    import PyPDF2
+except ImportError:
+    PyPDF2 = None
+
+# Load environment variables
+load_dotenv()
+PDF_MAX_BYTES = int(os.getenv("PDF_MAX_BYTES", str(50 * 1024 * 1024)))
+PDF_MAX_PAGES = int(os.getenv("PDF_MAX_PAGES", "50"))
+PDF_MAX_CHARS = int(os.getenv("PDF_MAX_CHARS", "200000"))
+PDF_TIMEOUT = float(os.getenv("PDF_TIMEOUT", "30"))
+
+# Page-parallel extraction: documents with at least PDF_PARALLEL_MIN_PAGES pages
+# are split into PDF_PAGES_PER_TASK page ranges across a process pool
+PDF_PROCESS_WORKERS = int(os.getenv("PDF_PROCESS_WORKERS", str(min(4, os.cpu_count() or 1))))
+PDF_PARALLEL_MIN_PAGES = int(os.getenv("PDF_PARALLEL_MIN_PAGES", "8"))
+PDF_PAGES_PER_TASK = int(os.getenv("PDF_PAGES_PER_TASK", "4"))
+PDF_PROCESS_START_METHOD = os.getenv("PDF_PROCESS_START_METHOD", "spawn")
+# "auto" samples pages with PyPDF2 and falls back to pdfplumber when it finds too little text
+PDF_ENGINE = os.getenv("PDF_ENGINE", "auto").lower()
+PDF_SAMPLE_PAGES = 2
+PDF_MIN_CHARS_PER_PAGE = 200
+
+logger = logging.getLogger(__name__)
+
+
+class PDFTooLarge(FetchError):
+    """Raised when a PDF is bigger than the download cap (a cut-off PDF cannot be parsed)."""
+
+
+@dataclass
+class PageTiming:
+    page: int
+    chars: int
+    seconds: float
+
+
+@dataclass
+class PDFExtraction:
+    """Extracted text plus how it was produced."""
+    text: str
+    engine: str
+    page_count: int
+    pages: List[PageTiming] = field(default_factory=list)
+    seconds: float = 0.0
+    parallel: bool = False
+
+
+# --- engines (module-level so worker processes can run them) ---
+
+def _pages_pdfplumber(stream, start: int, stop: int) -> Iterator[str]:
+    with pdfplumber.open(stream) as pdf:
+        for page in pdf.pages[start:stop]:
+            yield page.extract_text() or ""
+            # Drop the page's parsed layout objects before moving on
+            close = getattr(page, "close", None)
+            if close:
+                close()
+
+
+def _pages_pypdf2(stream, start: int, stop: int) -> Iterator[str]:
+    reader = PyPDF2.PdfReader(stream)
+    for index in range(start, min(len(reader.pages), stop)):
+        yield reader.pages[index].extract_text() or ""
+
+
+_EXTRACTORS = {
+    "pdfplumber": (_pages_pdfplumber, lambda: pdfplumber is not None),
+    "pypdf2": (_pages_pypdf2, lambda: PyPDF2 is not None),
+}
+
+
+def _check_engine(engine: str):
+    extract_pages, installed = _EXTRACTORS[engine]
+    if not installed():
+        raise ImportError(f"PDF engine '{engine}' is not installed")
+    return extract_pages
+
+
+def page_count(stream) -> int:
+    if PyPDF2 is not None:
+        return len(PyPDF2.PdfReader(stream).pages)
+    with pdfplumber.open(stream) as pdf:
+        return len(pdf.pages)
+
+
+def choose_engine(stream, engine: str = PDF_ENGINE) -> str:
+    """
+    Pick the extractor for one document.
+
+    PyPDF2 is several times faster and is enough for text-only pages;
+    pdfplumber's layout analysis is only used when PyPDF2 gets too little
+    text from the first pages (scanned-looking, table-heavy or oddly encoded).
+    """
+    if engine != "auto":
+        return engine
+    if PyPDF2 is None:
+        return "pdfplumber"
+    if pdfplumber is None:
+        return "pypdf2"
+    sample = list(_pages_pypdf2(stream, 0, PDF_SAMPLE_PAGES))
+    stream.seek(0)
+    if sample and sum(len(text.strip()) for text in sample) / len(sample) >= PDF_MIN_CHARS_PER_PAGE:
+        return "pypdf2"
+    return "pdfplumber"
+
+
+def _timed_pages(stream, engine: str, start: int, stop: int) -> List[Tuple[int, str, float]]:
+    pages = []
+    started = time.perf_counter()
+    for offset, text in enumerate(_check_engine(engine)(stream, start, stop)):
+        now = time.perf_counter()
+        pages.append((start + offset, text, now - started))
+        started = now
+    return pages
+
+
+def _extract_range(path: str, engine: str, start: int, stop: int) -> List[Tuple[int, str, float]]:
+    """Worker task: ``(page, text, seconds)`` for pages ``start``..``stop - 1`` of the PDF at ``path``."""
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as view:
+        return _timed_pages(view, engine, start, stop)
+
+
+class PDFExtractionService:
+    """
+    Extracts text from PDF files on disk, splitting large documents by page
+    range across a process pool so parsing does not hold the request
+    thread's GIL. Small documents are extracted in-process. Every
+    extraction reports per-page timings.
+    """
+
+    def __init__(self, workers: int = PDF_PROCESS_WORKERS, parallel_min_pages: int = PDF_PARALLEL_MIN_PAGES,
+                 pages_per_task: int = PDF_PAGES_PER_TASK):
+        self.workers = max(1, workers)
+        self.parallel_min_pages = parallel_min_pages
+        self.pages_per_task = max(1, pages_per_task)
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def _executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context(PDF_PROCESS_START_METHOD),
+                )
+            return self._pool
+
+    def extract(self, path: str, engine: str = PDF_ENGINE, max_pages: int = PDF_MAX_PAGES,
+                max_chars: int = PDF_MAX_CHARS, separator: str = "\n") -> PDFExtraction:
+        started = time.perf_counter()
+        with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as view:
+            engine = choose_engine(view, engine)
+            _check_engine(engine)
+            view.seek(0)
+            total = page_count(view)
+            stop = min(total, max_pages) if max_pages else total
+            parallel = self.workers > 1 and stop >= self.parallel_min_pages
+            if not parallel:
+                pages = self._serial(view, engine, stop, max_chars)
+        if parallel:
+            pages = self._parallel(path, engine, stop, max_chars)
+
+        text = separator.join(text for _, text, _ in pages)
+        if max_chars:
+            text = text[:max_chars]
+        result = PDFExtraction(
+            text=text,
+            engine=engine,
+            page_count=total,
+            pages=[PageTiming(page=index, chars=len(page_text), seconds=round(seconds, 4))
+                   for index, page_text, seconds in pages],
+            seconds=round(time.perf_counter() - started, 4),
+            parallel=parallel,
+        )
+        if result.pages:
+            slowest = max(result.pages, key=lambda p: p.seconds)
+            logger.info(
+                f"PDF: {len(result.pages)}/{total} pages via {engine}{' (parallel)' if parallel else ''} "
+                f"in {result.seconds:.2f}s; slowest page {slowest.page + 1} took {slowest.seconds:.2f}s"
+            )
+        return result
+
+    @staticmethod
+    def _serial(stream, engine: str, stop: int, max_chars: int) -> List[Tuple[int, str, float]]:
+        pages = []
+        collected = 0
+        started = time.perf_counter()
+        for index, text in enumerate(_check_engine(engine)(stream, 0, stop)):
+            now = time.perf_counter()
+            pages.append((index, text, now - started))
+            started = now
+            collected += len(text)
+            if max_chars and collected >= max_chars:
+                break
+        return pages
+
+    def _parallel(self, path: str, engine: str, stop: int, max_chars: int) -> List[Tuple[int, str, float]]:
+        executor = self._executor()
+        futures = [
+            executor.submit(_extract_range, path, engine, start, min(start + self.pages_per_task, stop))
+            for start in range(0, stop, self.pages_per_task)
+        ]
+        pages = []
+        collected = 0
+        try:
+            # Ranges are consumed in page order, so the character limit cuts at the same place as a serial run
+            for future in futures:
+                for page in future.result():
+                    pages.append(page)
+                    collected += len(page[1])
+                    if max_chars and collected >= max_chars:
+                        return pages
+        finally:
+            for future in futures:
+                future.cancel()
+        return pages
+
+    def close(self):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
+
+
+_service: Optional[PDFExtractionService] = None
+_service_lock = threading.Lock()
+
+
+def get_pdf_service() -> PDFExtractionService:
+    """Return the process-wide PDF extraction service, creating it on first use."""
+    global _service
+    with _service_lock:
+        if _service is None:
+            _service = PDFExtractionService()
+        return _service
+
+
+def pdf_text_from_url(url: str, headers: Optional[Dict[str, str]] = None, timeout: float = PDF_TIMEOUT,
+                      engine: str = PDF_ENGINE, max_pages: int = PDF_MAX_PAGES, max_chars: int = PDF_MAX_CHARS,
+                      max_bytes: int = PDF_MAX_BYTES, separator: str = "\n") -> str:
+    """
+    Download a PDF to a temporary file and extract its text with bounded memory.
+
+    The body is streamed to disk (at most ``max_bytes``) and parsed from that
+    file by the extraction service, so only the pages being extracted are
+    held in memory. Text is memoized per PDF content hash in the blob store,
+    so the same document is parsed once whatever URL it came from.
+    Raises ``FetchError`` for HTTP errors and ``PDFTooLarge`` over the cap.
+    """
+    fd, path = tempfile.mkstemp(prefix="pdf-", suffix=".pdf")
+    try:
+        with os.fdopen(fd, "w+b") as sink:
+            response = download(url, sink, headers=headers, timeout=timeout, max_bytes=max_bytes)
+            size = sink.tell()
+        response.raise_for_status()
+        if response.truncated:
+            raise PDFTooLarge(f"PDF larger than {max_bytes} bytes: {url}")
+
+        def extract() -> str:
+            if size == 0:
+                return ""
+            return get_pdf_service().extract(path, engine=engine, max_pages=max_pages,
+                                             max_chars=max_chars, separator=separator).text
+
+        kind = f"text:{engine}:{max_pages}:{max_chars}"
+        return derived_text(response.content_hash, kind, extract)
+    finally:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
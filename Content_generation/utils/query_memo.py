@@ -0,0 +1,99 @@
+import os
+import logging
+import threading
+from typing import Callable, Dict, List, Optional, Sequence
+
+from dotenv import load_dotenv
+from utils.disk_cache import DiskCache, cache_path
+from utils.custom_search import normalize_query
+
+# Load environment variables
+load_dotenv()
+# Keep memoized queries on disk (shared across processes and restarts) instead of only in memory
+QUERY_MEMO_PERSIST = os.getenv("QUERY_MEMO_PERSIST", "true").lower() in ("1", "true", "yes")
+QUERY_MEMO_TTL = float(os.getenv("QUERY_MEMO_TTL", str(24 * 3600)))
+
+logger = logging.getLogger(__name__)
+
+
+class QueryMemo:
+    """
+    Search queries generated so far for each topic, in generation order.
+
+    ``next_batch`` hands out queries the caller has not used yet and only
+    asks the generator for more (telling it which queries already exist)
+    once the memo runs out, so repeated searches and later search
+    iterations for a topic do not regenerate the whole set. With a
+    ``cache`` the memo lives there (and expires with it); otherwise it is
+    kept in memory for the life of the process.
+    """
+
+    def __init__(self, cache: Optional[DiskCache] = None):
+        self.cache = cache
+        self._memo: Dict[str, List[str]] = {}
+        self._lock = threading.Lock()
+        self._key_locks: Dict[str, threading.Lock] = {}
+        self._stats = {"hits": 0, "generations": 0}
+
+    @staticmethod
+    def _key(namespace: str, topic: str) -> str:
+        return f"queries:{namespace}:{normalize_query(topic)}"
+
+    def _load(self, key: str) -> List[str]:
+        queries = self.cache.get_json(key) if self.cache is not None else self._memo.get(key)
+        return list(queries or [])
+
+    def _save(self, key: str, queries: List[str]):
+        if self.cache is not None:
+            self.cache.set_json(key, queries)
+        else:
+            self._memo[key] = queries
+
+    def next_batch(self, namespace: str, topic: str, generate: Callable[[List[str]], List[str]],
+                   used: Sequence[str] = (), batch: int = 5) -> List[str]:
+        """
+        Up to ``batch`` memoized queries for ``topic`` that are not in ``used``.
+
+        When none are left, ``generate(existing)`` is called with every query
+        generated so far and its new queries are added to the memo.
+        """
+        key = self._key(namespace, topic)
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+        # One generation per topic at a time; concurrent callers wait and reuse its result
+        with key_lock:
+            queries = self._load(key)
+            used_keys = {normalize_query(q) for q in used}
+            fresh = [q for q in queries if normalize_query(q) not in used_keys]
+            if fresh:
+                self._stats["hits"] += 1
+                return fresh[:batch]
+
+            self._stats["generations"] += 1
+            known = {normalize_query(q) for q in queries} | used_keys
+            new = []
+            for query in generate(queries):
+                normalized = normalize_query(query)
+                if normalized and normalized not in known:
+                    known.add(normalized)
+                    new.append(query)
+            if new:
+                self._save(key, queries + new)
+            return new[:batch]
+
+    def stats(self) -> Dict[str, int]:
+        return dict(self._stats)
+
+
+_memo: Optional[QueryMemo] = None
+_memo_lock = threading.Lock()
+
+
+def get_query_memo() -> QueryMemo:
+    """Return the process-wide query memo, creating it on first use."""
+    global _memo
+    with _memo_lock:
+        if _memo is None:
+            cache = DiskCache(cache_path("query_memo.sqlite3"), ttl=QUERY_MEMO_TTL) if QUERY_MEMO_PERSIST else None
+            _memo = QueryMemo(cache)
+        return _memo
@@ -0,0 +1,81 @@
+import os
+import time
+import uuid
+import threading
+from dataclasses import dataclass, field
+from typing import Dict, Optional
+
+from dotenv import load_dotenv
+from utils.urls import normalize_url
+
+# Load environment variables
+load_dotenv()
+RESEARCH_SESSION_TTL = float(os.getenv("RESEARCH_SESSION_TTL", str(6 * 3600)))
+
+
+@dataclass
+class ResearchArtifact:
+    """What the pipeline already knows about one URL within a research session."""
+    url: str
+    title: str = ""
+    text: str = ""
+    summary: str = ""
+    topic: str = ""
+    updated: float = field(default_factory=time.time)
+
+
+class ResearchStore:
+    """
+    In-memory research artifacts grouped by session and keyed by normalized URL.
+
+    The search stage records the page text (and summary, when it made one) for
+    every URL it validated, so the summarize stage can skip fetching and
+    summarizing those URLs again. Sessions expire ``ttl`` seconds after their
+    last update.
+    """
+
+    def __init__(self, ttl: float = RESEARCH_SESSION_TTL):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._sessions: Dict[str, Dict[str, ResearchArtifact]] = {}
+        self._touched: Dict[str, float] = {}
+
+    @staticmethod
+    def new_session() -> str:
+        return uuid.uuid4().hex
+
+    def _prune(self, now: float):
+        expired = [sid for sid, touched in self._touched.items() if now - touched > self.ttl]
+        for sid in expired:
+            self._sessions.pop(sid, None)
+            self._touched.pop(sid, None)
+
+    def put(self, session_id: str, url: str, **fields) -> ResearchArtifact:
+        """Create or update the artifact for ``url``; empty values never overwrite known ones."""
+        now = time.time()
+        key = normalize_url(url)
+        with self._lock:
+            self._prune(now)
+            session = self._sessions.setdefault(session_id, {})
+            artifact = session.get(key) or ResearchArtifact(url=url)
+            for name, value in fields.items():
+                if value:
+                    setattr(artifact, name, value)
+            artifact.updated = now
+            session[key] = artifact
+            self._touched[session_id] = now
+            return artifact
+
+    def get(self, session_id: str, url: str) -> Optional[ResearchArtifact]:
+        if not session_id:
+            return None
+        with self._lock:
+            self._prune(time.time())
+            return self._sessions.get(session_id, {}).get(normalize_url(url))
+
+
+_store = ResearchStore()
+
+
+def get_research_store() -> ResearchStore:
+    return _store
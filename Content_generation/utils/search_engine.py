@@ -1,17 +1,25 @@
 import os
 import re
+import threading
 import requests
 from bs4 import BeautifulSoup
 import numpy as np
-import openai
-from googleapiclient.discovery import build
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from dotenv import load_dotenv
+from utils.llm_client import chat_completion, embed_texts
+from utils.custom_search import execute_cse, run_queries
+from utils.research_store import get_research_store
+from utils.seen_urls import get_rejected_urls
+from utils.domain_reputation import rank_by_domain
+from utils.query_memo import get_query_memo
 load_dotenv()
 
 GOOGLE_API_KEY = os.environ.get("GOOGLE_API_KEY")
 GOOGLE_CX = os.environ.get("GOOGLE_CX")
 OPENAI_API_KEY = os.environ.get("OPENAI_API_KEY")
-openai.api_key = os.getenv("OPENAI_API_KEY", OPENAI_API_KEY)
+
+# Number of candidate URLs tested for scrapeability at the same time
+SEARCH_MAX_WORKERS = int(os.environ.get("SEARCH_MAX_WORKERS", "8"))
 
 
 def clean_query(query: str) -> str:
@@ -21,38 +29,54 @@ def clean_query(query: str) -> str:
     return re.sub(r'\s+', ' ', query).strip()
 
 
-def generate_search_query(topic: str) -> list:
-    """Generate search queries without quotes"""
+def generate_search_query(topic: str, use_cache: bool = True, exclude: list = None) -> list:
+    """Generate search queries without quotes, different from any in ``exclude``"""
     prompt = f"""
     Generate 5 search queries for technical content about: {topic} 
     that focus on the latest, real-time, and factual information.
     The queries should target highly relevant blogs, articles,interviews and news.
     """
-    response = openai.ChatCompletion.create(
+    if exclude:
+        prompt += "Do not repeat or rephrase any of these queries:\n" + "\n".join(f"- {q}" for q in exclude)
+    queries_text = chat_completion(
         model="gpt-4",
         messages=[{"role": "user", "content": prompt}],
-        temperature=0.3
+        temperature=0.3,
+        use_cache=use_cache
     )
-    queries_text = response.choices[0].message.content
     raw_queries = [re.sub(r'^\d+\.\s*', '', q.strip()) 
                    for q in queries_text.splitlines() if q.strip()]
     return [clean_query(q.replace('"', '')) for q in raw_queries]
 
 
+def next_search_queries(topic: str, used: list = ()) -> list:
+    """
+    The next set of queries for ``topic`` that are not in ``used``.
+
+    Query sets are memoized per topic; new queries are generated (excluding
+    the ones already generated) only once the memoized ones are used up.
+    """
+    return get_query_memo().next_batch(
+        "search_engine", topic,
+        lambda existing: generate_search_query(topic, exclude=existing),
+        used=used, batch=5,
+    )
+
+
 def google_search(query: str, num_results: int = 10) -> list:
     """Returns list of search results (empty list on failure)"""
     try:
         query = clean_query(query)
-        service = build("customsearch", "v1", developerKey=GOOGLE_API_KEY)
         
         # Google Custom Search API has a maximum of 10 results per request
         num_results = min(10, num_results)
         
-        result = service.cse().list(
+        result = execute_cse(
+            GOOGLE_API_KEY,
             q=query,
             cx=GOOGLE_CX,
             num=num_results
-        ).execute()
+        )
         
         formatted_results = []
         for item in result.get("items", []):
@@ -71,24 +95,22 @@ def google_search(query: str, num_results: int = 10) -> list:
 
 def filter_by_relevance(results: list, topic: str, threshold: float = 0.7) -> list:
     """Filters search results based on semantic similarity"""
-    def get_embedding(text: str) -> np.ndarray:
-        response = openai.Embedding.create(
-            model="text-embedding-ada-002",
-            input=text
-        )
-        return np.array(response["data"][0]["embedding"])
-    
-    topic_embedding = get_embedding(topic)
+    if not results:
+        return []
+
+    # Embed the topic and every candidate in one batched request
+    texts = [topic] + [f"{r.get('title', '')} {r.get('snippet', '')}".strip() or "untitled" for r in results]
+    embeddings = np.array(embed_texts(texts, model="text-embedding-ada-002"))
+    topic_embedding, result_embeddings = embeddings[0], embeddings[1:]
+
+    # Cosine similarity of every candidate against the topic as one matrix-vector product
+    norms = np.linalg.norm(result_embeddings, axis=1) * np.linalg.norm(topic_embedding)
+    similarities = (result_embeddings @ topic_embedding) / np.where(norms == 0, 1, norms)
+
     filtered = []
-    
-    for r in results:
-        combined_text = f"{r.get('title', '')} {r.get('snippet', '')}"
-        text_embedding = get_embedding(combined_text)
-        similarity = np.dot(topic_embedding, text_embedding) / (
-            np.linalg.norm(topic_embedding) * np.linalg.norm(text_embedding)
-        )
+    for r, similarity in zip(results, similarities):
         if similarity > threshold:
-            r['similarity_score'] = similarity
+            r['similarity_score'] = float(similarity)
             filtered.append(r)
             
     return filtered
@@ -104,62 +126,148 @@ def assess_content_quality(text: str) -> float:
     
     Excerpt: {text[:1500]}
     """
-    response = openai.ChatCompletion.create(
-        model="gpt-4o-mini",
-        messages=[{"role": "user", "content": prompt}],
-        temperature=0.1
-    )
     try:
-        return float(response.choices[0].message.content.strip())
+        rating = chat_completion(
+            model="gpt-4o-mini",
+            messages=[{"role": "user", "content": prompt}],
+            temperature=0.1
+        )
+        return float(rating.strip())
     except:
         return 0.0
 
 class SearchAgent:
-    def __init__(self):
-        from utils.web_scrapping import extract_content_from_link
-        self.extract_content_from_link = extract_content_from_link
+    def __init__(self, max_workers: int = SEARCH_MAX_WORKERS):
+        from utils.web_scrapping import probe_page
+        self.probe_page = probe_page
         self.seen_urls = set()  # Track all URLs we've seen across searches
+        self._seen_lock = threading.Lock()  # queries run concurrently and share seen_urls
+        self.rejected_urls = get_rejected_urls()  # URLs that failed the probe in past searches
+        self.max_workers = max(1, max_workers)
+
+    def _test_candidate(self, result: dict, topic: str, stop_event: threading.Event, session_id: str = None):
+        """Scrape-test and quality-score one candidate; returns None if rejected or no longer needed."""
+        if stop_event.is_set():
+            return None
+        url = result.get("href", "")
+        print(f"Testing scrapeability of: {url}")
+
+        # Cheap probe only; pages are extracted and summarized once the user picks them
+        probe, rejection = self.probe_page(url)
+        if stop_event.is_set():
+            return None
+        if not probe:
+            # Only page-level verdicts are remembered; transient failures are retried by later searches
+            if rejection and self.rejected_urls is not None:
+                self.rejected_urls.add(url, rejection)
+            return None
+        if session_id and probe.complete:
+            # The probe read the whole page, so the summarize stage can skip fetching it
+            get_research_store().put(session_id, url, title=probe.title, text=probe.content, topic=topic)
+        result['is_scrapeable'] = True
+        # Add quality score
+        result['quality_score'] = assess_content_quality(result.get("snippet", ""))
+        return result
+
+    def _test_candidates(self, candidates: list, topic: str, needed: int, session_id: str = None) -> list:
+        """
+        Test candidates on a bounded worker pool and return the first ``needed`` accepted ones.
+        Candidates are ordered by domain reputation first.
+
+        As soon as enough candidates are accepted, queued tests are cancelled and
+        running ones stop before their next expensive step.
+        """
+        accepted = []
+        # Known-bad domains are not probed at all, and domains that scraped well go first
+        candidates = rank_by_domain(candidates, key=lambda r: r.get("href", ""))
+        if needed <= 0 or not candidates:
+            return accepted
 
-    def google_search_with_exclusions(self, query: str, num_results: int = 10) -> list:
-        """Performs Google search while excluding already seen URLs"""
+        stop_event = threading.Event()
+        executor = ThreadPoolExecutor(max_workers=min(self.max_workers, len(candidates)))
+        futures = {executor.submit(self._test_candidate, r, topic, stop_event, session_id): r for r in candidates}
+        try:
+            for future in as_completed(futures):
+                url = futures[future].get("href", "")
+                try:
+                    result = future.result()
+                except Exception as e:
+                    print(f"❌ Scraping test failed for {url}: {str(e)}")
+                    continue
+                if result:
+                    accepted.append(result)
+                    print(f"✅ Found scrapeable and relevant URL: {url}")
+                    if len(accepted) >= needed:
+                        break
+        finally:
+            stop_event.set()
+            executor.shutdown(wait=False, cancel_futures=True)
+        return accepted
+
+    def excluded_hosts(self, limit: int = 30) -> list:
+        """
+        Hosts of the URLs seen so far, sorted, so the same seen set always
+        gives the same ``-site:`` exclusions (and the same cached search)
+        whatever order the results arrived in.
+        """
+        with self._seen_lock:
+            hosts = {url.split("/")[2] for url in self.seen_urls if url.count("/") >= 2}
+        return sorted(hosts)[:limit]
+
+    def google_search_with_exclusions(self, query: str, num_results: int = 10, exclude_hosts: list = None) -> list:
+        """
+        Performs Google search while excluding already seen URLs.
+        Concurrent queries should share one ``exclude_hosts`` snapshot, taken
+        before they start, so their query text does not depend on which
+        responses came back first.
+        """
         try:
             query = clean_query(query)
             
-            # If we have seen URLs, add exclusions to the query
-            if self.seen_urls:
+            if exclude_hosts is None:
+                exclude_hosts = self.excluded_hosts()
+            if exclude_hosts:
                 # Add site exclusions to the query (up to 30 exclusions to keep query length reasonable)
-                exclusions = ' '.join([f'-site:{url.split("/")[2]}' for url in list(self.seen_urls)[:30]])
+                exclusions = ' '.join([f'-site:{host}' for host in exclude_hosts])
                 query = f"{query} {exclusions}"
             
-            service = build("customsearch", "v1", developerKey=GOOGLE_API_KEY)
-            result = service.cse().list(
+            result = execute_cse(
+                GOOGLE_API_KEY,
                 q=query,
                 cx=GOOGLE_CX,
                 num=min(10, num_results)
-            ).execute()
+            )
             
             formatted_results = []
-            for item in result.get("items", []):
-                url = item.get("link", "")
-                if url not in self.seen_urls:  # Double check we're not getting duplicates
-                    self.seen_urls.add(url)  # Track this URL
-                    formatted_results.append({
-                        "title": item.get("title", "No title"),
-                        "href": url,
-                        "snippet": item.get("snippet", ""),
-                        "date": item.get("pagemap", {}).get("metatags", [{}])[0].get("article:published_time", "")
-                    })
+            with self._seen_lock:
+                for item in result.get("items", []):
+                    url = item.get("link", "")
+                    if url not in self.seen_urls:  # Double check we're not getting duplicates
+                        self.seen_urls.add(url)  # Track this URL
+                        if self.rejected_urls is not None and self.rejected_urls.contains(url):
+                            continue  # Rejected by an earlier search; do not test it again
+                        formatted_results.append({
+                            "title": item.get("title", "No title"),
+                            "href": url,
+                            "snippet": item.get("snippet", ""),
+                            "date": item.get("pagemap", {}).get("metatags", [{}])[0].get("article:published_time", "")
+                        })
             return formatted_results
             
         except Exception as err:
             print(f"Google Search error: {err}")
             return []
 
-    def search(self, topic: str, num_results: int = 5, max_search_iterations: int = 3) -> list:
-        """Returns list of results with multiple search iterations if needed"""
+    def search(self, topic: str, num_results: int = 5, max_search_iterations: int = 3, session_id: str = None) -> list:
+        """
+        Returns list of results with multiple search iterations if needed.
+        With a ``session_id``, pages the scrapeability probe read in full are
+        kept in the research store for the summarize stage.
+        """
         try:
             scrapeable_results = []
             search_iteration = 0
+            used_queries = []
             
             while (len(scrapeable_results) < num_results and 
                    search_iteration < max_search_iterations):
@@ -167,48 +275,42 @@ class SearchAgent:
                 search_iteration += 1
                 print(f"\nStarting search iteration {search_iteration}/{max_search_iterations}")
                 
-                # Generate fresh queries for each iteration
-                queries = generate_search_query(topic)
+                # Memoized per topic; the LLM is only asked for more once the known queries are used up
+                queries = next_search_queries(topic, used_queries)
+                used_queries.extend(queries)
+                if not queries:
+                    print(f"No new queries for iteration {search_iteration}")
+                    break
                 iteration_results = []
                 
-                # Search with each query
-                for query in queries:
-                    try:
-                        results = self.google_search_with_exclusions(query, num_results=10)
-                        iteration_results.extend(results)
-                        print(f"Found {len(results)} new results for query: {query}")
-                    except Exception as e:
-                        print(f"Search failed for query '{query}': {str(e)}")
-                        continue
+                # Dispatch all queries concurrently with the same exclusions; results are
+                # deduplicated against seen_urls as they arrive
+                exclude_hosts = self.excluded_hosts()
+                responses = run_queries(
+                    queries,
+                    lambda query: self.google_search_with_exclusions(query, num_results=10,
+                                                                     exclude_hosts=exclude_hosts)
+                )
+                for query, results in responses:
+                    iteration_results.extend(results)
+                    print(f"Found {len(results)} new results for query: {query}")
 
                 if not iteration_results:
                     print(f"No new results found in iteration {search_iteration}")
                     break
 
-                # Test scrapeability
-                for result in iteration_results:
-                    if len(scrapeable_results) >= num_results:
-                        break
-                        
-                    try:
-                        url = result.get("href", "")
-                        print(f"Testing scrapeability of: {url}")
-                        
-                        # Try to extract content to verify scrapeability
-                        content = self.extract_content_from_link(url, topic)
-                        if content:  # If content extraction succeeded
-                            result['is_scrapeable'] = True
-                            # Check relevance before adding
-                            relevant_results = filter_by_relevance([result], topic)
-                            if relevant_results:
-                                # Add quality score
-                                quality = assess_content_quality(result.get("snippet", ""))
-                                result['quality_score'] = quality
-                                scrapeable_results.append(result)
-                                print(f"✅ Found scrapeable and relevant URL: {url}")
-                    except Exception as e:
-                        print(f"❌ Scraping test failed for {url}: {str(e)}")
-                        continue
+                # Check relevance for the whole iteration with a single batched embedding call
+                try:
+                    relevant_results = filter_by_relevance(iteration_results, topic)
+                except Exception as e:
+                    print(f"Relevance filtering failed: {str(e)}")
+                    relevant_results = []
+                print(f"{len(relevant_results)}/{len(iteration_results)} results are relevant to the topic")
+
+                # Test scrapeability of relevant results concurrently, stopping once we have enough
+                scrapeable_results.extend(
+                    self._test_candidates(relevant_results, topic, num_results - len(scrapeable_results), session_id)
+                )
 
                 print(f"End of iteration {search_iteration}. "
                       f"Found {len(scrapeable_results)}/{num_results} scrapeable results")
@@ -232,7 +334,7 @@ class SearchAgent:
             print(f"Search error: {str(e)}")
             return []
 
-def get_final_result(topic: str, num_results: int = 5) -> list:
+def get_final_result(topic: str, num_results: int = 5, session_id: str = None) -> list:
     """
     Returns list of results with consistent structure:
     [
@@ -247,7 +349,7 @@ def get_final_result(topic: str, num_results: int = 5) -> list:
     """
     try:
         agent = SearchAgent()
-        results = agent.search(topic, num_results=num_results)
+        results = agent.search(topic, num_results=num_results, session_id=session_id)
         
         # Ensure consistent output format
         formatted_results = []
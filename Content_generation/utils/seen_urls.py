@@ -0,0 +1,169 @@
+import os
+import math
+import mmap
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from typing import Any, Dict, Iterable, Optional
+
+from dotenv import load_dotenv
+from utils.disk_cache import cache_path
+from utils.urls import normalize_url
+
+# Load environment variables
+load_dotenv()
+SEEN_URLS_ENABLED = os.getenv("SEEN_URLS_ENABLED", "true").lower() in ("1", "true", "yes")
+# How long a rejected URL is skipped by later searches
+SEEN_URLS_REJECT_TTL = float(os.getenv("SEEN_URLS_REJECT_TTL", str(7 * 24 * 3600)))
+SEEN_URLS_BLOOM_CAPACITY = int(os.getenv("SEEN_URLS_BLOOM_CAPACITY", "1000000"))
+SEEN_URLS_BLOOM_ERROR_RATE = float(os.getenv("SEEN_URLS_BLOOM_ERROR_RATE", "0.01"))
+
+logger = logging.getLogger(__name__)
+
+
+def is_permanent_failure(status_code: int) -> bool:
+    """
+    Whether an HTTP status says the page itself is unusable (most 4xx).
+
+    Timeouts (408), rate limits (429) and server errors are transient and
+    must not put a URL in the rejected index.
+    """
+    return 400 <= status_code < 500 and status_code not in (408, 429)
+
+
+class BloomFilter:
+    """
+    Bloom filter over a memory-mapped bit file.
+
+    Bits are set in place, so the filter survives restarts without a save
+    step. ``contains`` can return false positives (about ``error_rate`` at
+    ``capacity`` entries) but never false negatives for keys added through
+    this filter.
+    """
+
+    def __init__(self, path: str, capacity: int = SEEN_URLS_BLOOM_CAPACITY,
+                 error_rate: float = SEEN_URLS_BLOOM_ERROR_RATE):
+        self.path = path
+        bits = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.size = (bits + 7) // 8
+        self.bits = self.size * 8
+        self.hashes = max(1, round(self.bits / capacity * math.log(2)))
+        # A missing or differently sized file cannot be reused; the caller refills the new one
+        self.created = not os.path.exists(path) or os.path.getsize(path) != self.size
+        if self.created:
+            with open(path, "wb") as f:
+                f.truncate(self.size)
+        self._file = open(path, "r+b")
+        self._map = mmap.mmap(self._file.fileno(), self.size)
+
+    def _positions(self, key: str) -> Iterable[int]:
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+        first, second = int.from_bytes(digest[:8], "big"), int.from_bytes(digest[8:], "big") | 1
+        return ((first + i * second) % self.bits for i in range(self.hashes))
+
+    def add(self, key: str):
+        for position in self._positions(key):
+            self._map[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, key: str) -> bool:
+        return all(self._map[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+    def close(self):
+        self._map.close()
+        self._file.close()
+
+
+class RejectedURLIndex:
+    """
+    URLs whose pages searches rejected (client errors, unsupported content
+    type, too little text), shared across searches and processes. Only
+    page-level verdicts belong here; network, server and LLM errors do not.
+
+    Lookups check the Bloom filter first, so the common "never rejected"
+    answer needs no database access; a possible hit is confirmed against the
+    exact SQLite table, which also enforces ``ttl``.
+    """
+
+    def __init__(self, path: str, bloom_path: str, ttl: Optional[float] = SEEN_URLS_REJECT_TTL,
+                 capacity: int = SEEN_URLS_BLOOM_CAPACITY, error_rate: float = SEEN_URLS_BLOOM_ERROR_RATE):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS rejected (
+                url TEXT PRIMARY KEY,
+                reason TEXT NOT NULL,
+                rejected REAL NOT NULL
+            )"""
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS rejected_time ON rejected(rejected)")
+        self._bloom = BloomFilter(bloom_path, capacity, error_rate)
+        self._stats = {"lookups": 0, "bloom_negatives": 0, "confirmed": 0, "false_positives": 0, "added": 0}
+        if self._bloom.created:
+            self._rebuild()
+
+    def _rebuild(self):
+        with self._lock:
+            for (url,) in self._conn.execute("SELECT url FROM rejected"):
+                self._bloom.add(url)
+
+    def add(self, url: str, reason: str = ""):
+        key = normalize_url(url)
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO rejected (url, reason, rejected) VALUES (?, ?, ?)",
+                (key, reason, now),
+            )
+            self._bloom.add(key)
+            self._stats["added"] += 1
+
+    def contains(self, url: str) -> bool:
+        key = normalize_url(url)
+        with self._lock:
+            self._stats["lookups"] += 1
+            if key not in self._bloom:
+                self._stats["bloom_negatives"] += 1
+                return False
+            row = self._conn.execute("SELECT rejected FROM rejected WHERE url = ?", (key,)).fetchone()
+            if row is None or (self.ttl and time.time() - row[0] > self.ttl):
+                self._stats["false_positives"] += 1
+                return False
+            self._stats["confirmed"] += 1
+            return True
+
+    def prune(self):
+        """Delete expired rows. Their Bloom bits stay set and only cost an extra exact lookup."""
+        if not self.ttl:
+            return
+        with self._lock:
+            self._conn.execute("DELETE FROM rejected WHERE rejected < ?", (time.time() - self.ttl,))
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM rejected").fetchone()[0]
+            return {**self._stats, "entries": entries, "bloom_bytes": self._bloom.size,
+                    "bloom_hashes": self._bloom.hashes, "ttl": self.ttl}
+
+
+_index: Optional[RejectedURLIndex] = None
+_index_lock = threading.Lock()
+
+
+def get_rejected_urls() -> Optional[RejectedURLIndex]:
+    """Return the shared rejected-URL index, or None when SEEN_URLS_ENABLED is off or it cannot be opened."""
+    global _index
+    if not SEEN_URLS_ENABLED:
+        return None
+    with _index_lock:
+        if _index is None:
+            try:
+                _index = RejectedURLIndex(cache_path("rejected_urls.sqlite3"), cache_path("rejected_urls.bloom"))
+                _index.prune()
+            except (OSError, sqlite3.Error) as e:
+                logger.warning(f"Rejected-URL index unavailable: {e}")
+                return None
+        return _index
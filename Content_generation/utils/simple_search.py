@@ -1,11 +1,12 @@
 import os
 import logging
-import requests
 from typing import List, Dict, Optional
-from bs4 import BeautifulSoup
-from googleapiclient.discovery import build
+from utils.html_engine import parse_html
 from dotenv import load_dotenv
-import openai
+from utils.llm_client import chat_completion
+from utils.custom_search import execute_cse, run_queries, unique_items
+from utils.fetcher import fetch, HTML_CONTENT_TYPES
+from utils.query_memo import get_query_memo
 
 # Load environment variables
 load_dotenv()
@@ -23,13 +24,29 @@ class SimpleSearcher:
         if not all([GOOGLE_API_KEY, GOOGLE_CX, OPENAI_API_KEY]):
             raise ValueError("Missing required API keys in environment variables")
         
-        self.service = build('customsearch', 'v1', developerKey=GOOGLE_API_KEY)
+        self.api_key = GOOGLE_API_KEY
         self.cx = GOOGLE_CX
         self.headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
         }
 
-    def generate_search_queries(self, topic: str) -> List[str]:
+    def generate_search_queries(self, topic: str, used: List[str] = ()) -> List[str]:
+        """Optimized search queries for ``topic``, generated with GPT-4 once and memoized per topic."""
+        try:
+            return get_query_memo().next_batch(
+                "simple_search", topic, lambda existing: self._generate_search_queries(topic, existing),
+                used=used, batch=3
+            )
+        except Exception as e:
+            logger.error(f"Error generating queries: {str(e)}")
+            # Fallback queries if GPT fails (not memoized, so the next search asks again)
+            return [
+                f"{topic} blog post 2024",
+                f"{topic} use case implementation",
+                f"{topic} case study technical documentation"
+            ]
+
+    def _generate_search_queries(self, topic: str, existing: List[str]) -> List[str]:
         """Generate optimized search queries using GPT-4."""
         prompt = f"""Generate 3 specific search queries for researching the topic: "{topic}"
 
@@ -45,80 +62,56 @@ class SimpleSearcher:
         
         Format: Return only the queries as a Python list of strings.
         Example: ["query 1", "query 2", "query 3"]"""
-
-        try:
-            response = openai.ChatCompletion.create(
-                model="gpt-4",
-                messages=[{"role": "user", "content": prompt}],
-                temperature=0.7
-            )
-            queries = eval(response.choices[0].message.content)
-            logger.info(f"Generated queries: {queries}")
-            return queries
-        except Exception as e:
-            logger.error(f"Error generating queries: {str(e)}")
-            # Fallback queries if GPT fails
-            return [
-                f"{topic} blog post 2024",
-                f"{topic} use case implementation",
-                f"{topic} case study technical documentation"
-            ]
+        if existing:
+            prompt += "\n\n        Do not repeat any of these queries:\n" + "\n".join(f"        - {q}" for q in existing)
+
+        content = chat_completion(
+            model="gpt-4",
+            messages=[{"role": "user", "content": prompt}],
+            temperature=0.7
+        )
+        queries = eval(content)
+        logger.info(f"Generated queries: {queries}")
+        return queries
 
     def search(self, topic: str, num_results: int = 10) -> List[Dict]:
         """Perform the search and return accessible results."""
         queries = self.generate_search_queries(topic)
-        all_results = []
-
-        for query in queries:
-            try:
-                # Perform Google search
-                results = self.service.cse().list(
-                    q=query,
-                    cx=self.cx,
-                    num=10
-                ).execute()
-
-                # Process each result
-                for item in results.get('items', []):
-                    url = item.get('link')
-                    if not url:
-                        continue
-
-                    # Check if content is accessible
-                    if self._is_accessible(url):
-                        result = {
-                            'title': item.get('title', ''),
-                            'url': url,
-                            'snippet': item.get('snippet', ''),
-                            'source_query': query
-                        }
-                        all_results.append(result)
-                        logger.info(f"Found accessible content: {url}")
-
-            except Exception as e:
-                logger.error(f"Error searching for query '{query}': {str(e)}")
-                continue
-
-        # Remove duplicates based on URL
-        seen_urls = set()
-        unique_results = []
-        for result in all_results:
-            if result['url'] not in seen_urls:
-                seen_urls.add(result['url'])
-                unique_results.append(result)
 
-        return unique_results[:num_results]
+        # Run all queries concurrently and merge the items, deduplicated by URL in arrival order
+        responses = run_queries(
+            queries,
+            lambda query: execute_cse(self.api_key, q=query, cx=self.cx, num=10)
+        )
+
+        unique_results = []
+        for query, item in unique_items(responses):
+            if len(unique_results) >= num_results:
+                break
+            url = item['link']
+
+            # Check if content is accessible
+            if self._is_accessible(url):
+                unique_results.append({
+                    'title': item.get('title', ''),
+                    'url': url,
+                    'snippet': item.get('snippet', ''),
+                    'source_query': query
+                })
+                logger.info(f"Found accessible content: {url}")
+
+        return unique_results
 
     def _is_accessible(self, url: str) -> bool:
         """Check if the content at the URL is accessible and not paywalled."""
         try:
-            response = requests.get(url, headers=self.headers, timeout=10)
-            if response.status_code != 200:
+            response = fetch(url, headers=self.headers, timeout=10, accept=HTML_CONTENT_TYPES)
+            if response.status_code != 200 or response.rejected:
                 return False
 
             # Check for common paywall indicators
-            soup = BeautifulSoup(response.text, 'html.parser')
-            text = soup.get_text().lower()
+            page_text = parse_html(response.content, response.charset).text()
+            text = page_text.lower()
             
             paywall_indicators = [
                 'subscribe', 'sign in', 'log in', 'paywall',
@@ -129,7 +122,7 @@ class SimpleSearcher:
                 return False
 
             # Check if there's enough content
-            content_length = len(soup.get_text())
+            content_length = len(page_text)
             if content_length < 500:  # Minimum content length threshold
                 return False
 
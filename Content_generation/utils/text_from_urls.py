@@ -1,14 +1,14 @@
-import os
 import re
-import openai
-import requests
-from bs4 import BeautifulSoup
+from utils.html_engine import parse_html, ParagraphTextBudget, PAGE_TEXT_TARGET_CHARS
+from utils.main_content import find_main_content
 from dotenv import load_dotenv
 import argparse
 from typing import Optional, Dict, Any
-import io
-import PyPDF2
 import urllib.parse
+from utils.llm_client import chat_completion
+from utils.fetcher import fetch, HTML_CONTENT_TYPES
+from utils.blob_store import derived_text, store_text
+from utils.pdf_text import pdf_text_from_url
 # Remove the circular import
 # from content_research import ContentResearcher
 #from utils.text_processing import summarize_text
@@ -18,7 +18,6 @@ import urllib.parse
 
 # Load environment variables
 load_dotenv()
-openai.api_key = os.getenv("OPENAI_API_KEY")
 
 # --- Helper functions ---
 def sanitize_text(text: str) -> str:
@@ -42,6 +41,11 @@ def sanitize_for_pdf(text: str) -> str:
     return text
 
 def summarize_text(text: str, topic: str) -> str:
+    # Summaries are kept per (text, topic), so identical text is summarized once
+    kind = f"summary:text_from_urls:{topic.strip().lower()}"
+    return derived_text(store_text(text), kind, lambda: _summarize(text, topic))
+
+def _summarize(text: str, topic: str) -> str:
     prompt = (
         f"Please provide a concise summary of the following article (keep it under 1500 words):\n"
         f"{text[:4000]}\n\n"
@@ -49,12 +53,12 @@ def summarize_text(text: str, topic: str) -> str:
         "Include factual details, numbers, and examples if any."
     )
     try:
-        resp = openai.ChatCompletion.create(
+        summary = chat_completion(
             model="gpt-4o-mini",
             messages=[{"role": "user", "content": prompt}],
             temperature=0.3
         )
-        return resp.choices[0].message.content.strip()
+        return summary.strip()
     except Exception as e:
         print(f"Summarization error: {e}")
         return ""
@@ -69,23 +73,25 @@ def extract_content_from_link(url: str, topic: Optional[str] = None) -> Dict[str
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
         }
         
-        # Download the content
-        response = requests.get(url, headers=headers, timeout=15)
-        response.raise_for_status()
-        
         content = ""
         
+        if not is_pdf:
+            # Only HTML bodies are downloaded here, and only until there is enough paragraph text
+            response = fetch(url, headers=headers, timeout=15, accept=HTML_CONTENT_TYPES,
+                             stop=ParagraphTextBudget(PAGE_TEXT_TARGET_CHARS) if PAGE_TEXT_TARGET_CHARS else None)
+            response.raise_for_status()
+            if response.rejected:
+                if 'application/pdf' not in response.content_type:
+                    return {
+                        "success": False,
+                        "error": f"Unsupported content type: {response.content_type}"
+                    }
+                is_pdf = True
+        
         if is_pdf:
-            # Handle PDF content
+            # Handle PDF content: streamed to a temp file and parsed page by page up to the limits
             try:
-                # Create a PDF reader object
-                pdf_file = io.BytesIO(response.content)
-                pdf_reader = PyPDF2.PdfReader(pdf_file)
-                
-                # Extract text from each page
-                for page_num in range(len(pdf_reader.pages)):
-                    page = pdf_reader.pages[page_num]
-                    content += page.extract_text() + "\n\n"
+                content = pdf_text_from_url(url, headers=headers, separator="\n\n")
                 
                 if not content.strip():
                     return {
@@ -100,14 +106,14 @@ def extract_content_from_link(url: str, topic: Optional[str] = None) -> Dict[str
                 }
         else:
             # Handle HTML content
-            soup = BeautifulSoup(response.text, 'html.parser')
+            doc = parse_html(response.content, response.charset)
             
             # Remove unwanted elements
-            for element in soup(['script', 'style', 'nav', 'footer', 'header']):
-                element.decompose()
+            doc.remove(['script', 'style', 'nav', 'footer', 'header'])
             
-            # Extract main content
-            content = ' '.join([p.get_text() for p in soup.find_all(['p', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6'])])
+            # Extract main content (the whole page when no container stands out)
+            main_content = find_main_content(doc) or doc
+            content = ' '.join([p.text() for p in main_content.select('p, h1, h2, h3, h4, h5, h6')])
             content = content.strip()
             
             if not content:
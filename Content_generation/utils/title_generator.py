@@ -1,24 +1,24 @@
 import os
 import json
-import openai
 from dotenv import load_dotenv
+from utils.llm_client import chat_completion
 
 load_dotenv()
-openai.api_key = os.getenv("OPENAI_API_KEY")
 
-def title_generate(topic: str) -> str:
+def title_generate(topic: str, use_cache: bool = True) -> str:
     prompt = f"""
 Generate 5 creative, SEO-optimized titles for a technical blog or article.
 Each title should be concise, attention-grabbing, and clearly convey the essence of the topic.
 
 Topic: {topic}
 """
-    response = openai.ChatCompletion.create(
+    content = chat_completion(
         model='gpt-4',
         messages=[{'role': 'user', 'content': prompt}],
-        temperature=0.4
+        temperature=0.4,
+        use_cache=use_cache
     )
-    titles = response.choices[0].message.content.strip().split('\n')
+    titles = content.strip().split('\n')
     titles = [title.strip("•- ") for title in titles if title.strip()]
     return titles
 
@@ -30,12 +30,11 @@ Previously, you generated these 5 titles on the topic "{topic}":
 Now, please generate 5 new, creative, SEO-optimized titles for a technical blog or article on the same topic.
 Each title should be concise, attention-grabbing, and clearly convey the essence of the topic.
 """
-    response = openai.ChatCompletion.create(
+    return chat_completion(
         model='gpt-4',
         messages=[{'role': 'user', 'content': prompt}],
         temperature=0.4
     )
-    return response.choices[0].message.content
 
 def save_results(data: dict, filename: str = "generated_titles.json"):
     if os.path.exists(filename):
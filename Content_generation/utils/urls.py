@@ -0,0 +1,31 @@
+from functools import lru_cache
+from urllib.parse import urlparse, urlunparse, parse_qs, urlencode
+
+# Query parameters that only track the visit and never change the page
+TRACKING_PREFIXES = ('utm_', 'ref', 'fbclid')
+
+
+@lru_cache(maxsize=8192)
+def normalize_url(url: str) -> str:
+    """
+    Canonical form of a URL for de-duplication and lookups.
+
+    Adds a missing scheme, lower-cases scheme and host, drops the fragment
+    and strips tracking query parameters (utm_*, ref*, fbclid). Results are
+    cached, since the same URLs are looked up repeatedly during a search.
+    """
+    url = url.strip()
+    if not url.startswith(("http://", "https://")):
+        url = f"https://{url}"
+    parsed = urlparse(url)
+    qs = parse_qs(parsed.query, keep_blank_values=True)
+    for key in list(qs):
+        if key.lower().startswith(TRACKING_PREFIXES):
+            del qs[key]
+    new_query = urlencode(qs, doseq=True)
+    return urlunparse(parsed._replace(
+        scheme=parsed.scheme.lower(),
+        netloc=parsed.netloc.lower(),
+        query=new_query,
+        fragment=''
+    ))
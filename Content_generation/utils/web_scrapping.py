@@ -1,12 +1,29 @@
 import os
-import openai
-import requests
-from bs4 import BeautifulSoup
+from dataclasses import dataclass
+from utils.html_engine import parse_html, ParagraphTextBudget, PAGE_TEXT_TARGET_CHARS
+from utils.main_content import main_paragraphs_text
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
+from utils.llm_client import chat_completion
+from utils.concurrency import HostLimiter
+from utils.fetcher import fetch, HTML_CONTENT_TYPES
+from utils.research_store import get_research_store
+from utils.blob_store import derived_text, store_text
+from utils.near_duplicates import new_duplicate_index
+from utils.domain_reputation import record_outcome, rank_by_domain
+from utils.seen_urls import is_permanent_failure
 
 # Load environment variables
 load_dotenv()
-openai.api_key = os.getenv("OPENAI_API_KEY")
+
+# Concurrency limits for extracting and summarizing links
+SCRAPE_MAX_WORKERS = int(os.getenv("SCRAPE_MAX_WORKERS", "8"))
+SCRAPE_PER_HOST_LIMIT = int(os.getenv("SCRAPE_PER_HOST_LIMIT", "2"))
+
+# Scrapeability probe: how much of a page to read and how much text it needs
+PROBE_MAX_BYTES = int(os.getenv("PROBE_MAX_BYTES", str(512 * 1024)))
+PROBE_TIMEOUT = float(os.getenv("PROBE_TIMEOUT", "7"))
+MIN_CONTENT_CHARS = 200
 
 def sanitize_text(text):
     if text is None:
@@ -27,52 +44,103 @@ def sanitize_for_pdf(text):
     return text
 
 def summarize_text(text, topic):
+    # Summaries are kept per (text, topic), so identical text is summarized once
+    kind = f"summary:web_scrapping:{topic.strip().lower()}"
+    return derived_text(store_text(text), kind, lambda: _summarize(text, topic))
+
+def _summarize(text, topic):
     prompt = f"""Please provide a concise summary of the following article:
 {text[:4000]}
 Ensure the summary is highly relevant to the topic: {topic}. Include factual details, numbers, and examples if any."""
     
     try:
-        response = openai.ChatCompletion.create(
+        summary = chat_completion(
             model="gpt-4o-mini",
             messages=[{"role": "user", "content": prompt}],
             temperature=0.3
         )
-        return response.choices[0].message.content.strip()
+        return summary.strip()
     except Exception as e:
         print(f"Summarization error: {e}")
         return ""
 
-def can_scrape_url(url, headers):
-    """Test if a URL can be successfully scraped."""
+def parse_page(markup, encoding=None):
+    """Return ``(title, content)`` from a page's title and main paragraphs."""
+    doc = parse_html(markup, encoding)
+    title = sanitize_text(doc.title or "No Title")
+
+    content = main_paragraphs_text(doc)
+    return title, sanitize_text(content)
+
+@dataclass
+class ProbeResult:
+    """A page that passed the scrapeability probe."""
+    url: str
+    title: str
+    content: str
+    complete: bool  # the whole page was read, so ``content`` is the full extraction
+
+def probe_page(url, headers=None, max_bytes=PROBE_MAX_BYTES, timeout=PROBE_TIMEOUT):
+    """
+    Cheap scrapeability check that never calls the LLM.
+
+    Checks the status and content type, reads at most ``max_bytes`` of the
+    body and requires enough paragraph text. Returns ``(probe, rejection)``:
+    a ``ProbeResult`` or None, and the reason the page itself is unusable
+    (client error, content type, too little text). ``rejection`` is empty
+    when the page was accepted or the failure may be transient (timeouts,
+    429, server errors). Successes and client errors or thin pages are
+    recorded in the domain reputation, so searches can skip domains that
+    keep failing; transient failures and non-HTML pages (a PDF link on a
+    good site) say nothing about the domain and are not recorded.
+    """
     try:
-        if not url.strip():
-            return False
-            
+        if not url or not url.strip():
+            return None, ""
+
         if not url.startswith(("http://", "https://")):
             url = f"https://{url}"
-            
-        response = requests.get(url, headers=headers, timeout=8)
+
+        response = fetch(url, headers=headers, timeout=timeout, max_bytes=max_bytes, accept=HTML_CONTENT_TYPES)
         if response.status_code != 200:
-            return False
-            
-        response.encoding = 'utf-8'
-        soup = BeautifulSoup(response.text, "html.parser")
-        
-        main_content = soup.find('article') or soup.find('div', class_='main-content') or soup.find('div', id='content')
-        paragraphs = main_content.find_all("p") if main_content else soup.find_all("p")
-        
-        content = " ".join([p.get_text() for p in paragraphs])
-        if len(content) < 200:
-            return False
-            
-        return True
-    except Exception:
-        return False
+            if not is_permanent_failure(response.status_code):
+                return None, ""
+            reason = f"HTTP {response.status_code}"
+            record_outcome(url, False, reason)
+            return None, reason
+        if response.rejected:
+            return None, f"content type {response.content_type}"
 
-def extract_and_summarize_content(links, topic=""):
+        title, content = parse_page(response.content, response.charset)
+        if len(content) < MIN_CONTENT_CHARS:
+            record_outcome(url, False, "too little text")
+            return None, "too little text"
+
+        record_outcome(url, True)
+        return ProbeResult(url=url, title=title, content=content, complete=not response.truncated), ""
+    except Exception as e:
+        print(f"Probe failed for {url}: {e}")
+        return None, ""
+
+def probe_url(url, headers=None, max_bytes=PROBE_MAX_BYTES, timeout=PROBE_TIMEOUT):
+    """``probe_page`` without the rejection reason: a ``ProbeResult`` or None."""
+    return probe_page(url, headers, max_bytes=max_bytes, timeout=timeout)[0]
+
+def can_scrape_url(url, headers):
+    """Test if a URL can be successfully scraped."""
+    return probe_url(url, headers) is not None
+
+def extract_and_summarize_content(links, topic="", max_workers=None, per_host_limit=None, session_id=None):
     """
     Extract and summarize content from multiple links.
     Since these links have already been validated as scrapable, we should have higher success rate.
+
+    Links are processed concurrently (at most ``max_workers`` at a time and
+    ``per_host_limit`` per host), but results keep the order of ``links``.
+    Pass the research ``session_id`` from the search stage to reuse what it
+    already fetched and summarized. Pages whose text nearly duplicates another
+    page of this batch (syndicated or mirrored copies) are dropped before
+    they are summarized.
     
     Returns a list of successful extractions, handling failures gracefully.
     """
@@ -81,10 +149,21 @@ def extract_and_summarize_content(links, topic=""):
     successful_links = 0
     failed_links = []
 
-    for link in links:
+    max_workers = max_workers or SCRAPE_MAX_WORKERS
+    host_limiter = HostLimiter(per_host_limit or SCRAPE_PER_HOST_LIMIT)
+    duplicates = new_duplicate_index(links)
+
+    def process_link(link):
+        with host_limiter.limit(link):
+            return extract_content_from_link(link, topic, session_id=session_id, duplicates=duplicates)
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(links)))) as executor:
+        futures = [executor.submit(process_link, link) for link in links]
+
+    # Collect in input order so the research data follows the order of the links
+    for link, future in zip(links, futures):
         try:
-            # Process each link individually
-            link_data = extract_content_from_link(link, topic)
+            link_data = future.result()
             
             # Only add valid data
             if validate_research_data(link_data):
@@ -114,7 +193,8 @@ def extract_and_summarize_content(links, topic=""):
         except Exception:
             pass
     
-    print(f"Processed {len(links)} links: {successful_links} successful, {len(failed_links)} failed")
+    print(f"Processed {len(links)} links: {successful_links} successful, {len(failed_links)} failed "
+          f"({len(duplicates.duplicates)} near-duplicates skipped)")
     return all_research_data
 
 def get_scrapable_urls(topic, requested_num=5, max_attempts=15):
@@ -138,8 +218,9 @@ def get_scrapable_urls(topic, requested_num=5, max_attempts=15):
     if not all_results:
         return []
     
-    # Sort results by quality score
+    # Sort results by quality score, then try domains that scraped well before first (known-bad ones are dropped)
     sorted_results = sorted(all_results, key=lambda x: x.get('quality_score', 0), reverse=True)
+    sorted_results = rank_by_domain(sorted_results, key=lambda x: x.get('href', ''))
     
     # Headers for scraping test
     headers = {
@@ -154,11 +235,8 @@ def get_scrapable_urls(topic, requested_num=5, max_attempts=15):
         url = result.get('href', '')
         print(f"Testing URL: {url}")
         
-        # Do a more thorough test by actually extracting content
-        test_data = extract_content_from_link(url, topic)
-        
-        # Only include URLs that can be successfully scraped
-        if test_data and validate_research_data(test_data):
+        # Probe only; the URLs that are picked get extracted and summarized later
+        if probe_url(url, headers):
             scrapable_urls.append(result)
             print(f"✅ Found fully scrapable URL: {url}")
             
@@ -181,44 +259,7 @@ def validate_url_for_scraping(url, headers=None):
                         'Chrome/91.0.4472.124 Safari/537.36')
         }
     
-    try:
-        # Skip empty URLs
-        if not url or not url.strip():
-            return False
-            
-        # Add https:// if missing
-        if not url.startswith(("http://", "https://")):
-            url = f"https://{url}"
-            
-        # Try to fetch the URL with a reasonable timeout
-        response = requests.get(url, headers=headers, timeout=10)
-        
-        # Check if the response is successful
-        if response.status_code != 200:
-            return False
-            
-        # Check content type to make sure it's HTML
-        content_type = response.headers.get('Content-Type', '').lower()
-        if 'text/html' not in content_type:
-            return False
-            
-        # Try to parse the content
-        response.encoding = 'utf-8'
-        soup = BeautifulSoup(response.text, "html.parser")
-        
-        # Check if we can find the main content
-        main_content = soup.find('article') or soup.find('div', class_='main-content') or soup.find('div', id='content')
-        paragraphs = main_content.find_all("p") if main_content else soup.find_all("p")
-        
-        # Extract text content
-        content = " ".join([p.get_text() for p in paragraphs])
-        
-        # Check if there's enough content
-        return len(content) >= 200
-        
-    except Exception as e:
-        print(f"URL validation error for {url}: {e}")
-        return False
+    return probe_url(url, headers, timeout=10) is not None
 
 def validate_research_data(data):
     """
@@ -248,8 +289,39 @@ def validate_research_data(data):
     
     return True
 
-def extract_content_from_link(link, topic=""):
-    """Extract content from a single link and return the data."""
+def fetch_page_content(link, headers=None):
+    """
+    Fetch a page and return ``(title, content)`` built from its main paragraphs.
+
+    Returns None when the page is unreachable or has too little text.
+    """
+    # Stop downloading once there is comfortably more paragraph text than the summarizer reads
+    response = fetch(link, headers=headers, timeout=7, accept=HTML_CONTENT_TYPES,
+                     stop=ParagraphTextBudget(PAGE_TEXT_TARGET_CHARS) if PAGE_TEXT_TARGET_CHARS else None)
+    if response.status_code != 200:
+        print(f"Failed to access {link}: HTTP {response.status_code}")
+        return None
+    if response.rejected:
+        print(f"Skipping {link}: not an HTML page ({response.content_type})")
+        return None
+        
+    title, content = parse_page(response.content, response.charset)
+
+    if len(content) < MIN_CONTENT_CHARS:
+        print(f"Content too short from {link}: {len(content)} chars")
+        return None
+
+    return title, content
+
+def extract_content_from_link(link, topic="", session_id=None, duplicates=None):
+    """
+    Extract content from a single link and return the data.
+
+    With a ``session_id``, text and summaries already recorded for this URL in
+    the research session are reused, and new results are recorded for later stages.
+    With a ``duplicates`` index, a page that nearly duplicates one already
+    checked against it is skipped without being summarized.
+    """
     print(f"Attempting extraction from: {link}")
     research_data = []
     
@@ -265,33 +337,35 @@ def extract_content_from_link(link, topic=""):
     if not link.startswith(("http://", "https://")):
         link = f"https://{link}"
 
-    try:
-        # Use a shorter timeout for testing scrapeability
-        response = requests.get(link, headers=headers, timeout=7)
-        if response.status_code != 200:
-            print(f"Failed to access {link}: HTTP {response.status_code}")
-            return []
-            
-        response.encoding = 'utf-8'
-        soup = BeautifulSoup(response.text, "html.parser")
-        title = soup.title.string if soup.title else "No Title"
-        title = sanitize_text(title)
-
-        main_content = soup.find('article') or soup.find('div', class_='main-content') or soup.find('div', id='content')
-        paragraphs = main_content.find_all("p") if main_content else soup.find_all("p")
+    store = get_research_store()
+    artifact = store.get(session_id, link)
 
-        content = " ".join([p.get_text() for p in paragraphs])
-        content = sanitize_text(content)
+    try:
+        if artifact and artifact.text:
+            print(f"Reusing content extracted during search for {link}")
+            title, content = artifact.title or "No Title", artifact.text
+        else:
+            page = fetch_page_content(link, headers)
+            if page is None:
+                return []
+            title, content = page
 
-        if len(content) < 200:
-            print(f"Content too short from {link}: {len(content)} chars")
+        original = duplicates.check(link, content) if duplicates is not None else None
+        if original:
+            print(f"Skipping {link}: near-duplicate of {original}")
             return []
 
-        summarized_text = summarize_text(content, topic)
+        if artifact and artifact.summary and artifact.topic == topic:
+            summarized_text = artifact.summary
+        else:
+            summarized_text = summarize_text(content, topic)
         if not summarized_text:
             print(f"Failed to summarize content from {link}")
             return []
 
+        if session_id:
+            store.put(session_id, link, title=title, text=content, summary=summarized_text, topic=topic)
+
         research_data.append({
             "title": title,
             "link": link,
@@ -304,4 +378,3 @@ def extract_content_from_link(link, topic=""):
         return []
         
     return research_data
-